@@ -3,10 +3,11 @@
 
 from __future__ import print_function
 import os
-import logging
-import argparse
+import sys
 
-from iterative_deepening import IterativeDeepening, ERR_MESSAGE, State, Searchable
+# The search itself is imported where used, so that --connect does not
+# wait for it.
+from search_space import State, Searchable
 
 
 class Domino(object):
@@ -43,6 +44,9 @@ class DominoSpace(Searchable):
       Neighbors(state): generate a list of neighboring states of the
         given state by trying concatenating dominos.
       Assert(state): determine if the STATE meets the goal.
+      NeighborsBatch(states), AssertBatch(states): bulk versions of the
+        above over a whole BFS layer.
+      Score(state): the length of the pending remainder of the STATE.
  '''
   def __init__(self, dominos,
                start_point=PostCorrespondenceState(("", ""), [])):
@@ -86,6 +90,36 @@ class DominoSpace(Searchable):
     neighbors = [self._CatDomino(state, d) for d in self.dominos]
     return [n for n in neighbors if n.IsValid()]
 
+  def NeighborsBatch(self, states):
+    '''
+    Generates the valid neighbors of a whole layer of states. The result
+    is the same as concatenating Neighbors(state) for every state, but
+    the domino strings are unpacked once for the layer, and no state is
+    built for a mismatching domino.
+
+    Args:
+      states: A list of valid states.
+    Returns:
+      A list of the valid neighbor states, in the order of states.
+    '''
+    contents = [(d.index, d.content[0], d.content[1]) for d in self.dominos]
+    neighbors = []
+    for state in states:
+      state_top, state_bottom = state.state
+      history = state.history
+      for index, domino_top, domino_bottom in contents:
+        new_top = state_top + domino_top
+        new_bottom = state_bottom + domino_bottom
+        # The shorter string has to be a prefix of the longer one.
+        if len(new_top) >= len(new_bottom):
+          if new_top.startswith(new_bottom):
+            neighbors.append(PostCorrespondenceState(
+                (new_top[len(new_bottom):], ""), history+[index]))
+        elif new_bottom.startswith(new_top):
+          neighbors.append(PostCorrespondenceState(
+              ("", new_bottom[len(new_top):]), history+[index]))
+    return neighbors
+
   def Assert(self, state):
     '''
     Assert if the given state meets the goal.
@@ -95,6 +129,19 @@ class DominoSpace(Searchable):
     else:
       return False
 
+  def AssertBatch(self, states):
+    '''
+    Assert if each of the given states meets the goal.
+    '''
+    return [s.IsValid() and s.state[0] == s.state[1] for s in states]
+
+  def Score(self, state):
+    '''
+    Score the given state by the length of its pending remainder, the
+    shorter being the closer to a match.
+    '''
+    return len(state.state[0]) + len(state.state[1])
+
   def Replay(self, state):
     '''
     Return the sequence of states towards the finding of the given state
@@ -153,29 +200,172 @@ def LoadFile(fname=None):
   return max_queue_size, max_states_num, dominos
 
 
-def main():
+def PrintSolutions(solver, max_length=None, k=None):
+  '''
+  Print the solutions of the solver one by one as they are found.
+
+  Args:
+    solver: The IterativeDeepening object to enumerate solutions with.
+    max_length: The maximum length of the solutions.
+    k: The maximum number of solutions to print.
+  '''
+  from iterative_deepening import ERR_MESSAGE
+  num_sols = 0
+  for sol, err in solver.Solutions(max_depth=max_length, k=k):
+    if sol:
+      num_sols += 1
+      print("Solution %d:\n\t%s"%(num_sols, sol))
+      sys.stdout.flush()
+    elif (err == 2 and max_length is not None and
+          solver.num_states_seen < solver.max_states_num):
+      # Cut off by the maximum length rather than the number of states.
+      print("No %ssolution within length %d."%(
+          "further " if num_sols else "", max_length))
+    elif err == 2 or not num_sols:
+      print(ERR_MESSAGE[err])
+
+
+# The command line options: flags, destination, type (None for a flag
+# taking no value), default and help.
+OPTIONS = [
+    (("-d", "--debug"), "debug", None, False,
+     "show all the debug logging infomation."),
+    (("-v", "--verbose"), "verbose", None, False,
+     "track the state changes towards the solution."),
+    (("-b", "--batched"), "batched", None, False,
+     "expand the BFS stage one whole layer at a time."),
+    (("-j", "--jobs"), "jobs", int, 1,
+     "number of processes to run DFS on."),
+    (("-a", "--all"), "all", None, False,
+     "print all the solutions as they are found."),
+    (("-k",), "k", int, None,
+     "print the K shortest solutions as they are found."),
+    (("-l", "--max-length"), "max_length", int, None,
+     "maximum length of the solutions printed by -a/-k."),
+    (("-s", "--shortest"), "shortest", None, False,
+     "search for a solution of minimal length."),
+    (("-w", "--beam-width"), "beam_width", int, None,
+     ("after BFS, run beam search keeping this many "
+      "states per depth instead of iterative deepening.")),
+    (("-c", "--cache"), "cache", str, None,
+     "directory of the cache of previous results."),
+    (("--cache-size",), "cache_size", int, 1000,
+     "maximum number of results kept in the cache."),
+    (("--serve",), "serve", str, None,
+     "run as a daemon solving the instances sent to this Unix socket."),
+    (("--connect",), "connect", str, None,
+     "send the instance to the daemon listening on this Unix socket."),
+]
+
+
+class Args(object):
+  '''
+  The parsed command line options, as attributes.
+  '''
+  def __init__(self, **kwargs):
+    self.__dict__.update(kwargs)
+
+
+def ParseArgs(argv):
+  '''
+  Parse the command line. Well-formed command lines are handled here,
+  since importing argparse takes longer than solving most instances.
+  Anything else, such as -h or a mistake, is left to argparse.
+
+  Args:
+    argv: The list of arguments, without the program name.
+  Returns:
+    An Args object.
+  '''
+  options = dict((dest, default) for _, dest, _, default, _ in OPTIONS)
+  flags = {}
+  for names, dest, value_type, _, _ in OPTIONS:
+    for name in names:
+      flags[name] = (dest, value_type)
+  fname = None
+  argv_iter = iter(argv)
+  for arg in argv_iter:
+    if arg in flags:
+      dest, value_type = flags[arg]
+      if value_type is None:
+        options[dest] = True
+        continue
+      value = next(argv_iter, None)
+      if value is None:
+        return _ParseArgsSlow(argv)
+      try:
+        options[dest] = value_type(value)
+      except ValueError:
+        return _ParseArgsSlow(argv)
+    elif arg.startswith("-") or fname is not None:
+      return _ParseArgsSlow(argv)
+    else:
+      fname = arg
+  if fname is None and not options["serve"]:
+    return _ParseArgsSlow(argv)
+  options["FILE"] = fname
+  return Args(**options)
+
+
+def _ParseArgsSlow(argv):
+  import argparse
   parser = argparse.ArgumentParser(
       description=("Using BFS with Iterative Deepening to solve "
                    "the post correspondence problem of dominos."))
-  parser.add_argument("FILE", type=str, help="input file name.")
-  parser.add_argument("-d", "--debug", action="store_true",
-                      help="show all the debug logging infomation.")
-  parser.add_argument("-v", "--verbose", action="store_true",
-                      help="track the state changes towards the solution.")
-  args = parser.parse_args()
-  fname = args.FILE
-  if args.debug:
-    logging.getLogger().setLevel(logging.INFO)
+  parser.add_argument("FILE", type=str, nargs="?", help="input file name.")
+  for names, dest, value_type, default, help_text in OPTIONS:
+    if value_type is None:
+      parser.add_argument(*names, dest=dest, action="store_true",
+                          help=help_text)
+    else:
+      parser.add_argument(*names, dest=dest, type=value_type,
+                          default=default, help=help_text)
+  args = parser.parse_args(argv)
+  if args.FILE is None and not args.serve:
+    parser.error("the FILE argument is required")
+  return Args(**vars(args))
 
-  max_queue_size, max_states_num, dominos = LoadFile(fname)
+
+def Run(args):
+  '''
+  Solve the instance in args.FILE and print the outcome, as asked by
+  the command line options.
+
+  Args:
+    args: The Args object of the command line.
+  '''
+  from iterative_deepening import IterativeDeepening, ERR_MESSAGE
+  max_queue_size, max_states_num, dominos = LoadFile(args.FILE)
 
   domino_space = DominoSpace(dominos=dominos)
   solver = IterativeDeepening(
       domino_space,
       max_queue_size=max_queue_size,
-      max_states_num=max_states_num)
-  sol, err = solver.Search()
-  logging.info("%r, %r", sol, err)
+      max_states_num=max_states_num,
+      num_workers=args.jobs)
+  if args.all or args.k:
+    PrintSolutions(solver, args.max_length, args.k)
+    return
+  cache = None
+  cached = None
+  if args.cache:
+    from result_cache import ResultCache
+    cache = ResultCache(args.cache, max_entries=args.cache_size)
+    cached = cache.Lookup(dominos, shortest=args.shortest)
+  if cached:
+    history, err = cached
+    sol = PostCorrespondenceState(("", ""), history) if history else None
+  elif args.shortest:
+    sol, err = solver.ShortestSearch()
+  else:
+    sol, err = solver.Search(
+        batched=args.batched, beam_width=args.beam_width)
+  if cache and not cached:
+    cache.Store(dominos, sol and sol.history, err, shortest=args.shortest,
+                complete=not args.beam_width)
+  if args.debug:
+    import logging
+    logging.info("%r, %r", sol, err)
   print(ERR_MESSAGE[err])
   if sol:
     print("Solution:\n\t%s"%sol)
@@ -189,5 +379,162 @@ def main():
     print(" ".join(["{}".format(s) for s in all_states]))
 
 
+def Serve(path):
+  '''
+  Run as a daemon, answering the requests sent to the Unix socket at
+  path one at a time, until interrupted.
+
+  A request is a single line, either a JSON object
+  {"argv": [...], "cwd": "..."}, as sent by Request, or plain command
+  line arguments, such as "data/input3.txt -v". Relative paths are
+  taken from cwd, default to the directory of the daemon. The answer is
+  the output of dominos.py with those arguments. Logging is only shown
+  if the daemon itself runs with -d.
+
+  Args:
+    path: The path of the Unix socket. A socket already there is only
+      replaced if no daemon listens on it anymore.
+  '''
+  import socket
+  import stat
+  # Loaded once, ahead of the requests.
+  import iterative_deepening
+  try:
+    mode = os.lstat(path).st_mode
+  except OSError:
+    mode = None
+  if mode is not None:
+    if not stat.S_ISSOCK(mode):
+      print('Not a socket: {}.'.format(path))
+      exit(1)
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+      probe.connect(path)
+    except socket.error:
+      # Left behind by a daemon which did not shut down cleanly.
+      os.remove(path)
+    else:
+      print('A daemon already listens on {}.'.format(path))
+      exit(1)
+    finally:
+      probe.close()
+  server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  server.bind(path)
+  server.listen(16)
+  try:
+    while True:
+      conn, _ = server.accept()
+      try:
+        _Answer(conn)
+      finally:
+        conn.close()
+  finally:
+    server.close()
+    os.remove(path)
+
+
+def _Answer(conn):
+  '''
+  Answer a single request of a Serve daemon.
+  '''
+  fin = conn.makefile("r")
+  fout = conn.makefile("w")
+  stdout, stderr = sys.stdout, sys.stderr
+  sys.stdout = sys.stderr = fout
+  try:
+    line = fin.readline().strip()
+    if not line:
+      # Nothing asked, as by the probe of another daemon.
+      return
+    if line.startswith("{"):
+      import json
+      request = json.loads(line)
+      argv = [str(arg) for arg in request["argv"]]
+      cwd = request.get("cwd") or os.getcwd()
+    else:
+      import shlex
+      argv = shlex.split(line)
+      cwd = os.getcwd()
+    args = ParseArgs(argv)
+    if args.serve or args.connect:
+      print("--serve and --connect are not accepted by the daemon.")
+      return
+    args.FILE = os.path.join(cwd, args.FILE)
+    if args.cache:
+      args.cache = os.path.join(cwd, args.cache)
+    Run(args)
+  except SystemExit:
+    # Bad arguments or input file, already reported.
+    pass
+  except Exception as err:
+    print("Error: {}".format(err))
+  finally:
+    sys.stdout, sys.stderr = stdout, stderr
+    fout.close()
+    fin.close()
+
+
+def Request(path, argv, cwd=None):
+  '''
+  Send an instance to a Serve daemon.
+
+  Args:
+    path: The path of the Unix socket of the daemon.
+    argv: The command line arguments, including the input file name.
+    cwd: The directory relative paths are taken from. Default to the
+      current directory.
+  Returns:
+    The output of the daemon.
+  '''
+  # The socket module loads the SSL library, and json compiles the
+  # regular expressions of its decoder, each taking longer than the
+  # whole request. Their C parts are enough here.
+  import _socket
+  from _json import encode_basestring_ascii as quote
+  client = _socket.socket(_socket.AF_UNIX, _socket.SOCK_STREAM)
+  client.connect(path)
+  request = '{"argv": [%s], "cwd": %s}\n' % (
+      ", ".join(quote(arg) for arg in argv), quote(cwd or os.getcwd()))
+  client.sendall(request.encode("utf-8"))
+  client.shutdown(_socket.SHUT_WR)
+  chunks = []
+  while True:
+    chunk = client.recv(1 << 16)
+    if not chunk:
+      break
+    chunks.append(chunk)
+  client.close()
+  return b"".join(chunks).decode("utf-8")
+
+
+def main(argv=None):
+  if argv is None:
+    argv = sys.argv[1:]
+  args = ParseArgs(argv)
+  if args.debug:
+    import logging
+    logging.basicConfig(level=logging.INFO)
+  if args.serve:
+    Serve(args.serve)
+  elif args.connect:
+    # Forward everything but the --connect option.
+    forward = []
+    argv_iter = iter(argv)
+    for arg in argv_iter:
+      if arg == "--connect":
+        next(argv_iter, None)
+      elif not arg.startswith("--connect="):
+        forward.append(arg)
+    import _socket
+    try:
+      answer = Request(args.connect, forward)
+    except _socket.error:
+      print('Cannot connect to {}.'.format(args.connect))
+      exit(1)
+    sys.stdout.write(answer)
+  else:
+    Run(args)
+
+
 if __name__ == '__main__':
   main()
@@ -1,7 +1,17 @@
 #! /usr/bin/python2
 # -*- coding: utf-8 -*-
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import time
 import unittest
+from StringIO import StringIO
 from dominos import Domino, PostCorrespondenceState, DominoSpace
+from dominos import ParseArgs, Serve, Request, main
+from iterative_deepening import IterativeDeepening
 
 class PostCorrespondenceStateTest(unittest.TestCase):
   def testIsValid(self):
@@ -109,6 +119,23 @@ class DominoSpaceTest(unittest.TestCase):
       self.assertSequenceEqual(
           [x.history for x in expected[idx]], [x.history for x in test_result])
 
+  def testNeighborsBatch(self):
+    states = [
+        PostCorrespondenceState(("", ""), []),
+        PostCorrespondenceState(("", "ca"), [1]),
+        PostCorrespondenceState(("b", ""), [3]),
+        PostCorrespondenceState(("c", ""), [3, 2]),
+        PostCorrespondenceState(("", "b"), [3, 2, 1, 4])
+    ]
+    expected = []
+    for state in states:
+      expected += self.domino_space.Neighbors(state)
+    test_result = self.domino_space.NeighborsBatch(states)
+    self.assertSequenceEqual(
+        [x.state for x in expected], [x.state for x in test_result])
+    self.assertSequenceEqual(
+        [x.history for x in expected], [x.history for x in test_result])
+
   def testAssert(self):
     states = [
         PostCorrespondenceState(("", ""), [1]),
@@ -124,6 +151,24 @@ class DominoSpaceTest(unittest.TestCase):
     ]
     test_result = [self.domino_space.Assert(s) for s in states]
     self.assertSequenceEqual(expected, test_result)
+    test_result = self.domino_space.AssertBatch(states)
+    self.assertSequenceEqual(expected, test_result)
+
+  def testScore(self):
+    states = [
+        PostCorrespondenceState(("", ""), [1]),
+        PostCorrespondenceState(("", "ca"), [1]),
+        PostCorrespondenceState(("b", ""), [3]),
+    ]
+    expected = [0, 2, 1]
+    test_result = [self.domino_space.Score(s) for s in states]
+    self.assertSequenceEqual(expected, test_result)
+
+  def testBeamSearch(self):
+    solver = IterativeDeepening(self.domino_space, max_states_num=100)
+    sol, err = solver.BeamSearch(2)
+    self.assertEqual(0, err)
+    self.assertEqual([3, 2, 1, 4, 3], sol.history)
 
   def testDominoFunctional(self):
     expected = [
@@ -136,5 +181,206 @@ class DominoSpaceTest(unittest.TestCase):
         [x.history for x in expected], [x.history for x in test_result])
 
 
+class DominoBeamSearchTest(unittest.TestCase):
+  def testSingleDomino(self):
+    # The solution D1 has the same state as the start point.
+    domino_space = DominoSpace(
+        dominos=[
+            Domino(1, ("bb", "bb")), Domino(2, ("a", "a")),
+            Domino(3, ("aa", "aa")), Domino(4, ("ab", "aba")),
+        ]
+    )
+    solver = IterativeDeepening(
+        domino_space, max_queue_size=1, max_states_num=100)
+    sol, err = solver.Search(beam_width=2)
+    self.assertEqual(0, err)
+    self.assertEqual([1], sol.history)
+
+
+class DominoSolutionsTest(unittest.TestCase):
+  def setUp(self):
+    self.domino_space = DominoSpace(
+        dominos=[
+            Domino(1, ("a", "a")), Domino(2, ("ab", "a")),
+            Domino(3, ("b", "bb")), Domino(4, ("ba", "b")),
+        ]
+    )
+
+  def testSolutions(self):
+    solver = IterativeDeepening(self.domino_space, max_states_num=1000)
+    results = list(solver.Solutions(max_depth=4))
+    self.assertSequenceEqual(
+        [([1], 0), ([1, 1], 0), ([2, 3], 0),
+         ([1, 1, 1], 0), ([1, 2, 3], 0), ([2, 3, 1], 0),
+         ([1, 1, 1, 1], 0), ([1, 1, 2, 3], 0), ([1, 2, 3, 1], 0),
+         ([2, 3, 1, 1], 0), ([2, 3, 2, 3], 0), (None, 2)],
+        [(sol and sol.history, err) for sol, err in results])
+
+  def testSolutionsThroughSolution(self):
+    # The only solutions are repetitions of the first one.
+    domino_space = DominoSpace(
+        dominos=[
+            Domino(1, ("bb", "b")), Domino(2, ("a", "aab")),
+            Domino(3, ("abbba", "bb")),
+        ]
+    )
+    solver = IterativeDeepening(domino_space, max_states_num=1000)
+    results = list(solver.Solutions(k=2))
+    self.assertSequenceEqual(
+        [[2, 3, 2, 1], [2, 3, 2, 1, 2, 3, 2, 1]],
+        [sol.history for sol, _ in results])
+
+  def testSolutionsThroughSameState(self):
+    # The prefixes 1-1 and 3-3 lead to the same states as 1 and 3.
+    domino_space = DominoSpace(
+        dominos=[
+            Domino(1, ("bbb", "bb")), Domino(2, ("aa", "b")),
+            Domino(3, ("b", "bb")),
+        ]
+    )
+    solver = IterativeDeepening(domino_space, max_states_num=1000)
+    results = list(solver.Solutions(max_depth=4))
+    self.assertSequenceEqual(
+        [[1, 3], [3, 1], [1, 1, 3, 3], [1, 3, 1, 3], [1, 3, 3, 1],
+         [3, 1, 1, 3], [3, 1, 3, 1], [3, 3, 1, 1], None],
+        [sol and sol.history for sol, _ in results])
+
+  def testSolutionsKThroughSameState(self):
+    domino_space = DominoSpace(
+        dominos=[
+            Domino(1, ("ba", "bab")), Domino(2, ("bba", "bab")),
+            Domino(3, ("ba", "a")),
+        ]
+    )
+    solver = IterativeDeepening(domino_space, max_states_num=1000)
+    results = list(solver.Solutions(k=2))
+    self.assertSequenceEqual(
+        [[1, 3], [1, 2, 3]], [sol.history for sol, _ in results])
+
+  def testShortestSearch(self):
+    solver = IterativeDeepening(
+        self.domino_space, max_queue_size=1, max_states_num=1000)
+    sol, err = solver.ShortestSearch()
+    self.assertEqual(0, err)
+    self.assertEqual([1], sol.history)
+
+  def testSolutionsK(self):
+    solver = IterativeDeepening(self.domino_space, max_states_num=1000)
+    results = list(solver.Solutions(k=1))
+    self.assertSequenceEqual(
+        [[1]], [sol.history for sol, _ in results])
+
+
+class ParseArgsTest(unittest.TestCase):
+  def testDefaults(self):
+    args = ParseArgs(["input.txt"])
+    self.assertEqual("input.txt", args.FILE)
+    self.assertFalse(args.debug)
+    self.assertEqual(1, args.jobs)
+    self.assertEqual(None, args.k)
+    self.assertEqual(None, args.serve)
+
+  def testOptions(self):
+    args = ParseArgs(["-v", "input.txt", "-j", "2", "--beam-width=5"])
+    self.assertTrue(args.verbose)
+    self.assertEqual(2, args.jobs)
+    self.assertEqual(5, args.beam_width)
+
+  def testCombinedFlags(self):
+    # Left to argparse by the fast path.
+    args = ParseArgs(["-dv", "input.txt"])
+    self.assertTrue(args.debug)
+    self.assertTrue(args.verbose)
+
+  def testServeWithoutFile(self):
+    args = ParseArgs(["--serve", "dominos.sock"])
+    self.assertEqual("dominos.sock", args.serve)
+    self.assertEqual(None, args.FILE)
+
+
+class ServeTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.path = os.path.join(self.directory, "dominos.sock")
+    self.daemon = multiprocessing.Process(target=Serve, args=(self.path,))
+    self.daemon.start()
+    while not os.path.exists(self.path):
+      time.sleep(0.01)
+
+  def tearDown(self):
+    self.daemon.terminate()
+    self.daemon.join()
+    shutil.rmtree(self.directory)
+
+  def testRequest(self):
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    output = Request(self.path, ["data/input1.txt"], cwd)
+    self.assertTrue(output.startswith("Solution found!"))
+    self.assertIn("D2-D3-D2-D1", output)
+    # The daemon keeps answering after a failed request.
+    output = Request(self.path, ["data/missing.txt"], cwd)
+    self.assertIn("Cannot open file", output)
+    output = Request(self.path, ["data/input1.txt", "-j", "x"], cwd)
+    self.assertIn("invalid int value", output)
+    self.assertIn("D2-D3-D2-D1", Request(self.path, ["data/input1.txt"], cwd))
+
+  def _Serve(self, path):
+    '''
+    Run Serve on path in this process. Return its output once it exits.
+    '''
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+      self.assertRaises(SystemExit, Serve, path)
+      return sys.stdout.getvalue()
+    finally:
+      sys.stdout = stdout
+
+  def testServeTwice(self):
+    self.assertIn("already listens", self._Serve(self.path))
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    self.assertIn("D2-D3-D2-D1", Request(self.path, ["data/input1.txt"], cwd))
+
+  def testNotSocket(self):
+    path = os.path.join(self.directory, "input.txt")
+    with open(path, "w") as fout:
+      fout.write("1\n")
+    self.assertIn("Not a socket", self._Serve(path))
+    with open(path) as fin:
+      self.assertEqual("1\n", fin.read())
+
+  def testConnectWithoutDaemon(self):
+    path = os.path.join(self.directory, "missing.sock")
+    stdout = sys.stdout
+    sys.stdout = StringIO()
+    try:
+      self.assertRaises(
+          SystemExit, main, ["--connect", path, "data/input1.txt"])
+      output = sys.stdout.getvalue()
+    finally:
+      sys.stdout = stdout
+    self.assertEqual("Cannot connect to {}.\n".format(path), output)
+
+  def testStaleSocket(self):
+    path = os.path.join(self.directory, "stale.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(path)
+    stale.close()
+    daemon = multiprocessing.Process(target=Serve, args=(path,))
+    daemon.start()
+    try:
+      cwd = os.path.dirname(os.path.abspath(__file__))
+      output = None
+      while not output:
+        try:
+          output = Request(path, ["data/input1.txt"], cwd)
+        except socket.error:
+          time.sleep(0.01)
+      self.assertIn("D2-D3-D2-D1", output)
+    finally:
+      daemon.terminate()
+      daemon.join()
+
+
 if __name__ == "__main__":
   unittest.main()
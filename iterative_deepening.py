@@ -15,7 +15,13 @@ provided here.
 '''
 
 from __future__ import print_function
-import logging
+import heapq
+import itertools
+import sys
+from collections import deque
+# The abstract classes live in a module of their own, so that programs
+# defining a search space need not import the search itself at startup.
+from search_space import State, Searchable
 
 ERR_MESSAGE = {
     0: "Solution found!",
@@ -23,46 +29,306 @@ ERR_MESSAGE = {
     2: "No solution found WITHIN GIVEN CONSTRAINS."
 }
 
+# Number of states a ParallelDFS worker takes from the shared budget at
+# a time, so that the budget lock is not taken for every single state.
+BUDGET_CHUNK = 64
+# Number of expansions between two checks of the shared flags by a busy
+# ParallelDFS worker.
+POLL_INTERVAL = 32
+# Seconds an idle ParallelDFS worker waits for stolen work at a time.
+IDLE_WAIT = 0.005
 
-class State(object):
+
+def _Log(msg, *args):
   '''
-  Abstract class for the states and its history in the search space.
+  Log an info message through the logger of the module, rather than the
+  root logger, so that nothing configures logging behind the back of
+  the program. Logging is not imported here, since it slows down the
+  start of every program: the message is dropped unless the program
+  imported it.
   '''
-  def __init__(self, state=None, history=None):
-    self.state = state
-    self.history = history
+  logging = sys.modules.get("logging")
+  if logging is not None:
+    logging.getLogger(__name__).info(msg, *args)
 
 
-class Searchable(object):
+class Frontier(object):
   '''
-  Abstract class for the search space.
+  Abstract class for the frontier of the core search loop,
+  IterativeDeepening.Run. It holds the nodes left to expand with their
+  depth, and decides in which order they are expanded.
+
+  Fields:
+    visited: The dict of the states visited so far, mapped to their
+      history. The frontier owns it, so that different strategies may
+      share it or not.
+    revisit: Whether the children already visited are expanded again,
+      as in the tree search of DFS, or dropped, as in a graph search.
+      Frontiers with a finer policy override Revisit instead.
   '''
-  def __init__(self, start_point=None):
-    self.start_point = start_point
+  def __init__(self, visited=None, revisit=False):
+    self.visited = {} if visited is None else visited
+    self.revisit = revisit
 
-  def Neighbors(self, state):
+  def Push(self, node, depth):
+    '''
+    Add a node at the given depth to the frontier.
     '''
-    Generates the neighbors of the given state in the search space.
+    raise NotImplementedError()
+
+  def Pop(self):
+    '''
+    Remove the next node to expand from the frontier. Raise IndexError
+    if the frontier is empty.
 
-    Args:
-      state: The State object whose neighbors are to be returned.
     Return:
-      A list of State objects.
+      A tuple (node, depth).
     '''
     raise NotImplementedError()
 
-  def Assert(self, state):
+  def Extend(self, children, depth):
+    '''
+    Add the children of an expanded node to the frontier, in the order
+    they were visited.
     '''
-    Assert if a given state satisfies the terminating condition.
+    for child in children:
+      self.Push(child, depth)
 
-    Args:
-      state: The State Object to be asserted.
-    Return:
-      bool
+  def Revisit(self, node, depth):
     '''
+    Decide if a node at the given depth, whose state was already
+    visited, is expanded again.
+    '''
+    return self.revisit
+
+  def Admit(self, node, depth, children):
+    '''
+    Decide if the children of a node may be visited. Returning False
+    stops the search with error code 2.
+    '''
+    return True
+
+  def Nodes(self):
+    '''
+    Return the list of the nodes in the frontier.
+    '''
+    raise NotImplementedError()
+
+  def __len__(self):
     raise NotImplementedError()
 
 
+class FifoFrontier(Frontier):
+  '''
+  First in, first out frontier of BFS, with an optional maximum size.
+  '''
+  def __init__(self, nodes=(), visited=None, max_size=None):
+    super(FifoFrontier, self).__init__(visited)
+    self.queue = deque((node, 0) for node in nodes)
+    self.max_size = max_size
+
+  def Push(self, node, depth):
+    self.queue.append((node, depth))
+
+  def Pop(self):
+    return self.queue.popleft()
+
+  def Extend(self, children, depth):
+    self.queue.extend((child, depth) for child in children)
+
+  def Admit(self, node, depth, children):
+    # If max_size is reached, insert node back to the front of the queue.
+    if (self.max_size is not None and
+        len(children) + len(self.queue) > self.max_size):
+      self.queue.appendleft((node, depth))
+      return False
+    return True
+
+  def Nodes(self):
+    return [node for node, _ in self.queue]
+
+  def __len__(self):
+    return len(self.queue)
+
+
+class LifoFrontier(Frontier):
+  '''
+  Last in, first out frontier of DFS. The children of a node are
+  expanded in the order they were generated.
+  '''
+  def __init__(self, visited=None, revisit=False):
+    super(LifoFrontier, self).__init__(visited, revisit)
+    self.stack = []
+
+  def Push(self, node, depth):
+    self.stack.append((node, depth))
+
+  def Pop(self):
+    return self.stack.pop()
+
+  def Extend(self, children, depth):
+    self.stack.extend([(child, depth) for child in reversed(children)])
+
+  def Nodes(self):
+    return [node for node, _ in reversed(self.stack)]
+
+  def __len__(self):
+    return len(self.stack)
+
+
+class FringeFrontier(LifoFrontier):
+  '''
+  Frontier of the iterations of ShortestSearch, each a DFS from the
+  nodes of a fringe down to a depth limit.
+
+  The shallowest depth every state was reached at is kept across
+  iterations. A state visited before is only expanded again if it is
+  reached no deeper than that, and at most once per iteration. The
+  children at the depth limit are not expanded, and make up the fringe
+  of the iteration, kept whenever it holds no more than max_size nodes.
+  '''
+  def __init__(self, max_size):
+    super(FringeFrontier, self).__init__()
+    self.max_size = max_size
+    # The shallowest depth each state was reached at, and the last
+    # iteration it was expanded in.
+    self.reached = {}
+    self.iteration = 0
+    self.max_depth = None
+    # The nodes at the depth limit, None if there are too many of them.
+    self.fringe = []
+    self.fringe_size = 0
+
+  def Start(self, seeds, depth, max_depth):
+    '''
+    Start a new iteration from seeds at the given depth, down to
+    max_depth.
+    '''
+    self.iteration += 1
+    self.max_depth = max_depth
+    self.fringe = []
+    self.fringe_size = 0
+    self.stack.extend((seed, depth) for seed in reversed(seeds))
+
+  def Revisit(self, node, depth):
+    # Not reached yet if visited among the same children, which are
+    # about to be expanded.
+    reached = self.reached.get(node.state)
+    if (reached is None or reached[0] < depth or
+        reached[1] == self.iteration):
+      return False
+    reached[1] = self.iteration
+    return True
+
+  def Extend(self, children, depth):
+    if depth < self.max_depth:
+      # Only the fringe holds states not reached before, since the
+      # shallower ones were all reached in the previous iterations.
+      self.stack.extend([(child, depth) for child in reversed(children)])
+      return
+    reached = self.reached
+    for child in children:
+      if child.state not in reached:
+        reached[child.state] = [depth, self.iteration]
+    self.fringe_size += len(children)
+    if self.fringe is not None:
+      if len(self.fringe) + len(children) <= self.max_size:
+        self.fringe.extend(children)
+      else:
+        self.fringe = None
+
+
+class PriorityFrontier(Frontier):
+  '''
+  Frontier of best-first search, always expanding the node of lowest
+  key first. Ties are broken in first in, first out order.
+  '''
+  def __init__(self, key, visited=None):
+    super(PriorityFrontier, self).__init__(visited)
+    self.key = key
+    self.heap = []
+    self.counter = itertools.count()
+
+  def Push(self, node, depth):
+    heapq.heappush(
+        self.heap, (self.key(node), next(self.counter), node, depth))
+
+  def Pop(self):
+    _, _, node, depth = heapq.heappop(self.heap)
+    return node, depth
+
+  def Nodes(self):
+    return [entry[2] for entry in sorted(self.heap)]
+
+  def __len__(self):
+    return len(self.heap)
+
+
+class BeamFrontier(Frontier):
+  '''
+  Frontier of beam search. Nodes are expanded layer by layer, and only
+  the width nodes of lowest key of every layer are kept. The next layer
+  is gathered in a bounded heap, so that no more than width nodes per
+  layer are ever held.
+
+  Unless a visited dict is given, only the states of the layer being
+  expanded and of its children are remembered as visited, so that the
+  memory stays bounded by the width, whatever the depth. The seeds of
+  the search were never goal-tested by the beam, and are not
+  remembered, so that a child on the state of a seed is still visited.
+  '''
+  def __init__(self, key, width, nodes=(), visited=None):
+    '''
+    Args:
+      key: A function scoring the nodes, lower meaning more promising.
+      width: The number of nodes kept per layer.
+      nodes: The first layer, at depth 0, kept whole whatever the width.
+      visited: See Frontier.
+    '''
+    super(BeamFrontier, self).__init__(visited)
+    self.key = key
+    self.width = width
+    self.forget = visited is None
+    self.layer = deque((node, 0) for node in nodes)
+    # Max-heap of the best nodes of the next layer so far, through
+    # negated keys and counters.
+    self.next_layer = []
+    self.counter = itertools.count()
+    # Number of nodes left out of the beam.
+    self.num_dropped = 0
+
+  def Push(self, node, depth):
+    if self.width <= 0:
+      self.num_dropped += 1
+      return
+    entry = (-self.key(node), -next(self.counter), node, depth)
+    if len(self.next_layer) < self.width:
+      heapq.heappush(self.next_layer, entry)
+      return
+    self.num_dropped += 1
+    if entry > self.next_layer[0]:
+      heapq.heapreplace(self.next_layer, entry)
+
+  def Pop(self):
+    if not self.layer:
+      # Move on to the next layer, best nodes first.
+      self.next_layer.sort(reverse=True)
+      self.layer.extend((node, depth) for _, _, node, depth in self.next_layer)
+      self.next_layer = []
+      if self.forget:
+        self.visited = dict(
+            (node.state, node.history) for node, depth in self.layer
+            if depth)
+    return self.layer.popleft()
+
+  def Nodes(self):
+    return ([node for node, _ in self.layer] +
+            [entry[2] for entry in sorted(self.next_layer, reverse=True)])
+
+  def __len__(self):
+    return len(self.layer) + len(self.next_layer)
+
+
 class IterativeDeepening(object):
   '''
   This is a generic class for BFS with Iterative Deepening.
@@ -73,13 +339,26 @@ class IterativeDeepening(object):
   methods:
     Neighbors(state): Generate the neighboring states.
     Assert(state):    Assert if the state meets the goal.
+  and optionally the bulk versions NeighborsBatch(states) and
+  AssertBatch(states) used by LayeredBFS, and Score(state) used by
+  BestFirst and BeamSearch.
+
+  BFS, DFS, BestFirst, BeamSearch, ShortestSearch and the workers of
+  ParallelDFS are strategies on top of the core loop Run, differing only
+  in their Frontier. LayeredBFS and Solutions run loops of their own:
+  the former expands whole layers at once through the batch hooks, and
+  the latter enumerates paths rather than states, going on past the
+  solutions.
   '''
-  def __init__(self, searchable, max_queue_size=100, max_states_num=1000):
+  def __init__(self, searchable, max_queue_size=100, max_states_num=1000,
+               num_workers=1):
     '''
     Args:
       searchable:     The Searchable object representing the search space.
       max_queue_size: The maximum size of the queue maintained during BFS.
       max_states_num: The maximum number of states to be explored.
+      num_workers:    The number of processes DFS runs on. With more than
+        one, DFS is delegated to ParallelDFS.
     '''
     self.searchable = searchable
     self.bfs_queue = []
@@ -93,11 +372,131 @@ class IterativeDeepening(object):
     self.num_states_seen = 0
     self.max_queue_size = min(max_queue_size, 2**20)
     self.max_states_num = max_states_num
+    self.num_workers = num_workers
+    # The number of expansions left before the search pauses, shared by
+    # all the calls of _Loop within a slice of SearchSteps. None means no
+    # limit.
+    self.expansions_left = None
+    # The _DFSPool of ParallelDFS while IterativeDeepening runs.
+    self.dfs_pool = None
+
+  def Run(self, frontier, seed=None, max_depth=None):
+    '''
+    The core loop of the search strategies. It starts from the seed at
+    depth 0, and expands the nodes in the order given by the frontier.
+    The children of a node are visited, that is counted, recorded in
+    frontier.visited, and goal-tested, before they join the frontier.
+    States seen during BFS are never visited again.
+
+    Args:
+      frontier: The Frontier object of the strategy.
+      seed: A State object to start with. Default to
+        self.searchable.start_point.
+      max_depth: Nodes at this depth are not expanded. Default to no
+        limit.
+    Returns:
+      sol: The solution state. If not found, None is returned.
+      err: Exit code
+        0 - sulution found;
+        1 - no soluion exists within the depth of the search;
+        2 - solution not found within the constraints.
+    '''
+    frontier.Push(seed or self.searchable.start_point, 0)
+    return self._Loop(frontier, max_depth)
+
+  def _Loop(self, frontier, max_depth=None):
+    '''
+    Expand the nodes of the frontier until a solution is found, or the
+    frontier or the budget is exhausted. See Run. Once expansions_left
+    runs out, pause and return (None, None). Calling _Loop again on the
+    same frontier resumes the search.
+    '''
+    neighbors_of = self.searchable.Neighbors
+    seen_bfs_states = self.seen_bfs_states
+    # Bound once, out of the hot loop.
+    pop, admit, extend = frontier.Pop, frontier.Admit, frontier.Extend
+    visit = self._Visit
+    left = self.expansions_left
+    try:
+      while True:
+        if (self.num_states_seen >= self.max_states_num and frontier and
+            not self._MoreStates()):
+          # No solution was found within the limits of search.
+          return None, 2
+        if left is not None:
+          if left <= 0:
+            return (None, None) if frontier else (None, 1)
+          left -= 1
+        try:
+          node, depth = pop()
+        except IndexError:
+          # The frontier is exhausted.
+          return None, 1
+        if max_depth is not None and depth >= max_depth:
+          # Deep enough. No need to explore the neighbors.
+          continue
+        children = [
+            child for child in neighbors_of(node)
+            if child.state not in seen_bfs_states]
+        if not admit(node, depth, children):
+          return None, 2
+        fresh = []
+        sol, err = visit(children, frontier, depth + 1, fresh)
+        extend(fresh, depth + 1)
+        if err is not None:
+          return sol, err
+    finally:
+      if left is not None:
+        self.expansions_left = left
+
+  def _Visit(self, children, frontier, depth, fresh):
+    '''
+    The hot path of the core loop. Count, record and goal-test every
+    child at the given depth not visited before, appending those to be
+    expanded to fresh.
+
+    Returns:
+      (child, 0) for the first child meeting the goal, (None, 2) if the
+      budget is exhausted, (None, None) otherwise.
+    '''
+    goal = self.searchable.Assert
+    visited = frontier.visited
+    for child in children:
+      if child.state in visited:
+        if frontier.Revisit(child, depth):
+          fresh.append(child)
+        continue
+      if (self.num_states_seen >= self.max_states_num and
+          not self._MoreStates()):
+        return None, 2
+      self.num_states_seen += 1
+      visited[child.state] = child.history
+      if goal(child):
+        return child, 0
+      fresh.append(child)
+    return None, None
+
+  def _MoreStates(self):
+    '''
+    Called by the core loop once max_states_num states are visited.
+    Return True if max_states_num was raised, so that the search goes
+    on. The workers of ParallelDFS take more states from their shared
+    budget here.
+    '''
+    return False
 
-  def _GetNewNeighbors(self, state):
-    return [
-        neighbor for neighbor in self.searchable.Neighbors(state)
-        if neighbor.state not in self.seen_bfs_states]
+  def _Slices(self, frontier, max_depth=None):
+    '''
+    Generator running _Loop on the frontier, pausing whenever
+    expansions_left runs out. Yields None at every pause, then the
+    (sol, err) of the search.
+    '''
+    while True:
+      sol, err = self._Loop(frontier, max_depth)
+      if err is not None:
+        yield sol, err
+        return
+      yield None
 
   def BFS(self, seed=None, max_queue_size=None):
     '''
@@ -113,32 +512,89 @@ class IterativeDeepening(object):
         1 - no soluion exists within the depth of the search;
         2 - solution not found within the maximum number of states.
     '''
+    return _LastStep(self._BFSSteps(seed, max_queue_size))
+
+  def _BFSSteps(self, seed=None, max_queue_size=None):
+    '''
+    BFS in slices. See _Slices.
+    '''
     # Initialize.
-    max_queue_size = None or self.max_queue_size
+    if max_queue_size is None:
+      max_queue_size = self.max_queue_size
+    seed_state = seed or self.searchable.start_point
+    frontier = FifoFrontier(
+        self.bfs_queue + [seed_state],
+        visited=self.seen_bfs_states,
+        max_size=max_queue_size)
+    for step in self._Slices(frontier):
+      if step is None:
+        yield None
+    self.bfs_queue = frontier.Nodes()
+    _Log("bfs queue: %s", self.bfs_queue)
+    yield step
+
+  def LayeredBFS(self, seed=None, max_queue_size=None):
+    '''
+    Level-synchronous variant of BFS. The whole queue is expanded as one
+    layer through Searchable.NeighborsBatch, the next layer is
+    deduplicated in bulk against the states seen so far, and the goal
+    test runs on the new layer through Searchable.AssertBatch.
+
+    The queue only ever holds complete layers. If the next layer would
+    not fit in max_queue_size, it is discarded and self.bfs_queue keeps
+    the current layer, ready to seed IterativeDeepening.
+
+    Args:
+      seed: A State object to start with. Default to
+        self.searchable.start_point.
+      max_queue_size: Maximum size of the queue maintained during
+        BFS. Default to self.max_queue_size.
+    Returns:
+      sol: The solution state. If not found, None is returned.
+      err: Exit code
+        0 - sulution found;
+        1 - no soluion exists within the depth of the search;
+        2 - solution not found within the maximum number of states.
+    '''
+    # Initialize.
+    if max_queue_size is None:
+      max_queue_size = self.max_queue_size
     seed_state = seed or self.searchable.start_point
     self.bfs_queue.append(seed_state)
+    seen = self.seen_bfs_states
     while (
         self.num_states_seen < self.max_states_num and
         self.bfs_queue):
-      logging.info("bfs queue: %s", self.bfs_queue)
-      node = self.bfs_queue.pop(0)
-      # Get unseen neighboring states.
-      neighbors = self._GetNewNeighbors(node)
-      # If max_queue_size is reached, stop bfs.
-      # Insert node back to the front of the queue.
-      if len(neighbors) + len(self.bfs_queue) > max_queue_size:
-        self.bfs_queue.insert(0, node)
+      _Log("bfs layer: %s", self.bfs_queue)
+      # Expand the layer and drop the states seen before, either in
+      # previous layers or earlier in this one.
+      layer_seen = {}
+      next_layer = []
+      for neighbor in self.searchable.NeighborsBatch(self.bfs_queue):
+        if neighbor.state not in seen and neighbor.state not in layer_seen:
+          layer_seen[neighbor.state] = neighbor.history
+          next_layer.append(neighbor)
+      # If max_queue_size is reached, stop bfs with the current layer
+      # still in the queue.
+      if len(next_layer) > max_queue_size:
         return None, 2
-      for neighbor in neighbors:
-        if self.num_states_seen >= self.max_states_num:
-          # No solution was found within the limits of search.
-          return None, 2
-        self.num_states_seen += 1
-        self.seen_bfs_states[neighbor.state] = neighbor.history
-        if self.searchable.Assert(neighbor):
+      # Only register as many states as the budget allows.
+      budget = self.max_states_num - self.num_states_seen
+      exhausted = len(next_layer) > budget
+      if exhausted:
+        next_layer = next_layer[:budget]
+      for neighbor in next_layer:
+        seen[neighbor.state] = neighbor.history
+      self.num_states_seen += len(next_layer)
+      self.bfs_queue = next_layer
+      for neighbor, found in zip(
+          next_layer, self.searchable.AssertBatch(next_layer)):
+        if found:
           # Solution found.
           return neighbor, 0
-        self.bfs_queue.append(neighbor)
+      if exhausted:
+        # No solution was found within the limits of search.
+        return None, 2
     if self.bfs_queue:
       return None, 2
     else:
@@ -156,43 +612,106 @@ class IterativeDeepening(object):
         1 - no soluion exists within the depth of the search;
         2 - solution not found within the maximum number of states.
     '''
-    # Initialization.
-    neighbors = self._GetNewNeighbors(root)
-    for neighbor in neighbors:
-      if neighbor.state not in self.seen_dfs_states:
-        if self.num_states_seen >= self.max_states_num:
-          return None, 2
-        self.num_states_seen += 1
-        self.seen_dfs_states[neighbor.state] = neighbor.history
-        if self.searchable.Assert(neighbor):
-          return neighbor, 0
-    dfs_stack = [(root, 1, neighbors)]
-    # Iteration-based DFS with constraint on depth.
-    while dfs_stack:
-      logging.info("dfs stack: %s", dfs_stack)
-      if not dfs_stack[-1][2]:
-        # All neighbors visited. Finshed with the last element.
-        dfs_stack.pop(-1)
-        continue
-      depth = dfs_stack[-1][1]
-      if depth >= max_depth:
-        # Deep enough. No need to explore the neighbors.
-        dfs_stack.pop(-1)
-        continue
-      # Get an element. Explore its neihgbors.
-      node = dfs_stack[-1][2].pop(0)
-      neighbors = self._GetNewNeighbors(node)
-      if not neighbors:
-        continue
-      for neighbor in neighbors:
-        if neighbor.state not in self.seen_dfs_states:
-          if self.num_states_seen >= self.max_states_num:
-            return None, 2
-          self.num_states_seen += 1
-          self.seen_dfs_states[neighbor.state] = neighbor.history
-          if self.searchable.Assert(neighbor):
-            return neighbor, 0
-      dfs_stack.append((node, depth+1, neighbors))
+    return _LastStep(self._DFSSteps(root, max_depth))
+
+  def _DFSSteps(self, root, max_depth=1000):
+    '''
+    DFS in slices. See _Slices. ParallelDFS runs in a single slice.
+    '''
+    if self.num_workers > 1:
+      yield self.ParallelDFS(root, max_depth)
+      return
+    # States seen in previous calls are expanded again, since they may
+    # now be at a lower depth than max_depth.
+    frontier = LifoFrontier(visited=self.seen_dfs_states, revisit=True)
+    frontier.Push(root, 0)
+    for step in self._Slices(frontier, max_depth):
+      yield step
+
+  def BestFirst(self, seed=None, key=None):
+    '''
+    Best-first search, always expanding the most promising state seen
+    so far. The states visited are shared with BFS.
+
+    Args:
+      seed: A State object to start with. Default to
+        self.searchable.start_point.
+      key: A function scoring the states, lower meaning more promising.
+        Default to self.searchable.Score.
+    Returns:
+      sol: The solution state. If not found, None is returned.
+      err: Exit code
+        0 - sulution found;
+        1 - no soluion exists;
+        2 - solution not found within the maximum number of states.
+    '''
+    frontier = PriorityFrontier(
+        key or self.searchable.Score, visited=self.seen_bfs_states)
+    return self.Run(frontier, seed)
+
+  def ParallelDFS(self, root, max_depth=1000, num_workers=None):
+    '''
+    DFS spread over several worker processes with work stealing. The
+    children of the root are visited here as in DFS, and handed out as
+    the first task. Every worker runs the core loop on a LifoFrontier,
+    and splits half of the shallowest nodes of its frontier off to the
+    shared task queue whenever another worker is idle.
+
+    The workers share the state budget, taken in chunks of BUDGET_CHUNK
+    states, and all stop as soon as one of them finds a solution. Each
+    worker keeps its own copy of seen_dfs_states, merged back here when
+    they are done. A state reached by several workers is thus counted
+    once by each of them.
+
+    During IterativeDeepening the workers are those of self.dfs_pool,
+    started once for the whole run. Otherwise they are started for this
+    call only. The states are passed between the processes, and should
+    compare by value.
+
+    Args:
+      root: The root of the DFS.
+      max_depth: Maximum depth of the DFS.
+      num_workers: The number of worker processes, if they are started
+        for this call. Default to self.num_workers, or the number of CPUs
+        if that is 1.
+    Returns:
+      sol: The solution state. If not found, None is returned.
+      err: Exit code
+        0 - sulution found;
+        1 - no soluion exists within the depth of the search;
+        2 - solution not found within the maximum number of states.
+    '''
+    if max_depth < 1:
+      return None, 1
+    # Expand the root here, and hand its children out as the first task.
+    frontier = LifoFrontier(visited=self.seen_dfs_states, revisit=True)
+    children = [
+        child for child in self.searchable.Neighbors(root)
+        if child.state not in self.seen_bfs_states]
+    fresh = []
+    sol, err = self._Visit(children, frontier, 1, fresh)
+    if err is not None:
+      return sol, err
+    if not fresh:
+      return None, 1
+    frontier.Extend(fresh, 1)
+    pool = self.dfs_pool
+    if max_depth <= 1:
+      if pool is not None:
+        pool.Visited(frontier.stack)
+      return None, 1
+    if pool is None:
+      pool = _DFSPool(self, num_workers or self.num_workers)
+    try:
+      sol, exhausted = pool.Explore(frontier.stack, max_depth)
+    finally:
+      if pool is not self.dfs_pool:
+        pool.Close()
+    _Log("parallel dfs return: %r", sol)
+    if sol:
+      return sol, 0
+    if exhausted:
+      return None, 2
     return None, 1
 
   def IterativeDeepening(self, seeds=None):
@@ -213,37 +732,281 @@ class IterativeDeepening(object):
         1 - no soluion exists;
         2 - solution not found within the maximum number of states.
     '''
+    return _LastStep(self._IterativeDeepeningSteps(seeds))
+
+  def _IterativeDeepeningSteps(self, seeds=None):
+    '''
+    IterativeDeepening in slices. See _Slices.
+    '''
     iterate_depth = 0
     num_states_before = self.num_states_seen
     seed_list = seeds or self.bfs_queue
+    pool = None
+    if self.num_workers > 1 and self.dfs_pool is None:
+      # Start the workers of ParallelDFS once for all the iterations.
+      pool = self.dfs_pool = _DFSPool(self, self.num_workers)
+    try:
+      while True:
+        iterate_depth += 1
+        _Log("Iteration deptp = %d", iterate_depth)
+        for seed in seed_list:
+          for step in self._DFSSteps(seed, iterate_depth):
+            if step is None:
+              yield None
+          sol, err = step
+          _Log("dfs return: %r, %r", sol, err)
+          _Log(
+              "States: %r/%r", self.num_states_seen, self.max_states_num)
+          if sol:
+            yield sol, err
+            return
+          # ParallelDFS may run out of budget with a few states reserved
+          # by its workers left unvisited.
+          if err == 2 or self.num_states_seen >= self.max_states_num:
+            yield None, 2
+            return
+
+        if num_states_before == self.num_states_seen:
+          # If no new states is seen in an iteration, no more will show up.
+          # There is therefore no solution.
+          yield None, 1
+          return
+        else:
+          num_states_before = self.num_states_seen
+    finally:
+      if pool is not None:
+        self.dfs_pool = None
+        pool.Close()
+
+  def ShortestSearch(self):
+    '''
+    Search for a solution of minimal depth. LayeredBFS first explores
+    complete layers within max_queue_size. Iterative deepening then
+    goes on from the last layer, iteration d exploring down to depth d
+    below it. Only the states first reached in iteration d are new, and
+    they are all at depth d, so the first solution found is a shallowest
+    one.
+
+    The shallowest depth every state was reached at is kept across
+    iterations, so that a state is expanded at most once per iteration,
+    and never from a deeper path. The fringe of an iteration, its nodes
+    at depth d, is cached whenever it holds no more than max_queue_size
+    states. The next iteration then resumes from it, instead of walking
+    again from the last cached fringe. The iterations run the core loop
+    on a FringeFrontier.
+
+    Returns:
+      sol: The solution state. If not found, None is returned.
+      err: Exit code
+        0 - sulution found;
+        1 - no soluion exists;
+        2 - solution not found within the constraints.
+    '''
+    sol, err = self.LayeredBFS()
+    _Log("States: %r/%r", self.num_states_seen, self.max_states_num)
+    if err != 2 or self.num_states_seen >= self.max_states_num:
+      return sol, err
+    frontier = FringeFrontier(self.max_queue_size)
+    fringe = self.bfs_queue
+    fringe_depth = 0
+    iterate_depth = 0
     while True:
       iterate_depth += 1
-      logging.info("Iteration deptp = %d", iterate_depth)
-      for seed in seed_list:
-        sol, err = self.DFS(seed, iterate_depth)
-        logging.info("dfs return: %r, %r", sol, err)
-        logging.info("States: %r/%r", self.num_states_seen, self.max_states_num)
-        if sol:
-          return sol, err
+      _Log("Iteration deptp = %d, resuming from depth %d",
+           iterate_depth, fringe_depth)
+      frontier.Start(fringe, fringe_depth, iterate_depth)
+      sol, err = self._Loop(frontier)
+      if err != 1:
+        return sol, err
+      if not frontier.fringe_size:
+        # Nothing deeper to explore.
+        return None, 1
+      if frontier.fringe is not None:
+        fringe = frontier.fringe
+        fringe_depth = iterate_depth
+
+  def Solutions(self, max_depth=None, k=None):
+    '''
+    Generator enumerating the solutions reachable from the start point
+    by iterative deepening. Unlike Search, it does not stop at the first
+    solution, and yields them as they are found, in nondecreasing depth:
+    iteration d only yields the solutions at depth d. Solutions are
+    expanded as well, since they may be the prefix of longer ones.
+
+    Every path is explored, since distinct solutions may go through the
+    same state from different prefixes. Only what is known to lead to
+    no solution is pruned: for every state, the largest number of moves
+    from it explored without meeting a solution is kept. Once an
+    iteration reaches no new state, all states are known, and those from
+    which no solution is reachable at all are never explored again, so
+    that the enumeration ends if the solutions are finitely many.
+
+    Since paths rather than states are explored, max_states_num bounds
+    the number of nodes visited over all the iterations, revisits
+    included.
+
+    Args:
+      max_depth: Maximum depth of the solutions. Default to no limit.
+      k: Stop after the k shallowest solutions. Default to all of them.
+    Yields:
+      (sol, 0) for every solution found. Unless the k-th solution was
+      reached, (None, err) is yielded at last, err being
+        1 - no more soluion exists;
+        2 - no more solution found within max_depth or the maximum
+          number of states.
+    '''
+    root = self.searchable.start_point
+    neighbors_of = self.searchable.Neighbors
+    goal = self.searchable.Assert
+    # The states reached so far, mapped to the states next to them once
+    # expanded. The start point is expanded in every iteration, and may
+    # be reached again through a solution.
+    successors = {root.state: [
+        neighbor.state for neighbor in neighbors_of(root)]}
+    # The states next to a solution.
+    goal_parents = set()
+    # The largest number of moves from a state known to lead to no
+    # solution.
+    fruitless = {}
+    dead = float("inf")
+    complete = False
+    num_sols = 0
+    iterate_depth = 0
+    while max_depth is None or iterate_depth < max_depth:
+      iterate_depth += 1
+      _Log("Iteration deptp = %d", iterate_depth)
+      num_states_before = len(successors)
+      # Whether some node that may lead to a solution is left unexplored
+      # because of the depth limit.
+      cut_off = False
+      # Frames of [node, depth, iterator over the neighbors of node,
+      # whether a solution was met below node].
+      dfs_stack = [[root, 0, iter(neighbors_of(root)), False]]
+      while dfs_stack:
+        frame = dfs_stack[-1]
+        node = next(frame[2], None)
+        if node is None:
+          dfs_stack.pop(-1)
+          if frame[3]:
+            if dfs_stack:
+              dfs_stack[-1][3] = True
+          else:
+            state = frame[0].state
+            fruitless[state] = max(
+                fruitless.get(state, 0), iterate_depth - frame[1])
+          continue
         if self.num_states_seen >= self.max_states_num:
-          return None, 2
+          yield None, 2
+          return
+        self.num_states_seen += 1
+        depth = frame[1] + 1
+        if goal(node):
+          frame[3] = True
+          goal_parents.add(frame[0].state)
+          # Shallower solutions were yielded in the previous iterations.
+          if depth == iterate_depth:
+            yield node, 0
+            num_sols += 1
+            if k and num_sols >= k:
+              return
+        if node.state not in successors:
+          successors[node.state] = None
+        known = fruitless.get(node.state, 0)
+        if known >= iterate_depth - depth:
+          # Nothing to find below node, down to the depth limit.
+          if known != dead:
+            cut_off = True
+          continue
+        neighbors = neighbors_of(node)
+        if successors[node.state] is None:
+          successors[node.state] = [neighbor.state for neighbor in neighbors]
+        dfs_stack.append([node, depth, iter(neighbors), False])
+      if not cut_off:
+        # Nothing deeper to explore.
+        yield None, 1
+        return
+      if not complete and len(successors) == num_states_before:
+        # No new state is to show up. Rule out for good the states from
+        # which no solution is reachable.
+        complete = True
+        for state in self._Fruitless(successors, goal_parents):
+          fruitless[state] = dead
+    yield None, 2
 
-      if num_states_before == self.num_states_seen:
-        # If no new states is seen in an iteration, no more will show up.
-        # There is therefore no solution.
-        return None, 1
-      else:
-        num_states_before = self.num_states_seen
+  @staticmethod
+  def _Fruitless(successors, goal_parents):
+    '''
+    Return the states of successors from which none of goal_parents is
+    reachable.
+    '''
+    predecessors = {}
+    for state, next_states in successors.items():
+      for next_state in next_states or ():
+        predecessors.setdefault(next_state, []).append(state)
+    live = set(goal_parents)
+    queue = deque(live)
+    while queue:
+      for state in predecessors.get(queue.popleft(), ()):
+        if state not in live:
+          live.add(state)
+          queue.append(state)
+    return [state for state in successors if state not in live]
 
-    return None, 2
+  def BeamSearch(self, width, seeds=None, key=None):
+    '''
+    Beam search, expanding layer by layer only the width most promising
+    states of every layer. The memory is thus bounded by width times the
+    depth of the states, at the cost of completeness: when some states
+    were left out of the beam, failing to find a solution does not mean
+    there is none.
 
-  def Search(self):
+    Args:
+      width: The number of states kept per layer.
+      seeds: A list of State objects to start with, all kept in the
+        first layer whatever the width. Default to
+        [self.searchable.start_point].
+      key: A function scoring the states, lower meaning more promising.
+        Default to self.searchable.Score.
+    Returns:
+      sol: The solution state. If not found, None is returned.
+      err: Exit code
+        0 - sulution found;
+        1 - no soluion exists;
+        2 - solution not found within the constraints, or with states
+          left out of the beam.
+    '''
+    return _LastStep(self._BeamSteps(width, seeds, key))
+
+  def _BeamSteps(self, width, seeds=None, key=None):
+    '''
+    BeamSearch in slices. See _Slices.
+    '''
+    # All the seeds make up the first layer, so that none of them is left
+    # out unexplored.
+    frontier = BeamFrontier(
+        key or self.searchable.Score, width,
+        seeds or [self.searchable.start_point])
+    for step in self._Slices(frontier):
+      if step is None:
+        yield None
+    sol, err = step
+    _Log("beam search left out %d states", frontier.num_dropped)
+    if err == 1 and frontier.num_dropped:
+      yield None, 2
+    else:
+      yield sol, err
+
+  def Search(self, batched=False, beam_width=None):
     '''
     This function first call BFS (with constraint on maximum queue size
     and maximum number of states). If necessary, it will then call
     IterativeDeepening (with constraint on maximum number of states).
     It will then return the result and error code.
 
+    Args:
+      batched: Use the level-synchronous LayeredBFS instead of BFS.
+      beam_width: If given, go on after BFS with a BeamSearch of this
+        width instead of IterativeDeepening.
     Returns:
       sol: The solution state. If not found, None is returned.
       err: Exit code
@@ -251,12 +1014,354 @@ class IterativeDeepening(object):
         1 - no soluion exists;
         2 - solution not found within the constraints.
     '''
-    sol, err = self.BFS()
-    logging.info(self.bfs_queue)
-    logging.info("States: %r/%r", self.num_states_seen, self.max_states_num)
+    return _LastStep(self.SearchSteps(None, batched, beam_width))
+
+  def SearchSteps(self, quantum=1000, batched=False, beam_width=None):
+    '''
+    Generator running Search in slices of at most quantum expansions,
+    so that a caller may interleave several searches. The quantum spans
+    the stages and the seeds of the search within a slice. LayeredBFS
+    and ParallelDFS run in a single slice.
+
+    Args:
+      quantum: The maximum number of expansions per slice. None means a
+        single slice.
+      batched, beam_width: See Search.
+    Yields:
+      None after every slice but the last, then the (sol, err) of Search.
+    '''
+    self.expansions_left = quantum
+    try:
+      for step in self._SearchSteps(batched, beam_width):
+        yield step
+        self.expansions_left = quantum
+    finally:
+      self.expansions_left = None
+
+  def _SearchSteps(self, batched=False, beam_width=None):
+    '''
+    Search in slices. See _Slices.
+    '''
+    if batched:
+      sol, err = self.LayeredBFS()
+    else:
+      for step in self._BFSSteps():
+        if step is None:
+          yield None
+      sol, err = step
+    _Log(self.bfs_queue)
+    _Log("States: %r/%r", self.num_states_seen, self.max_states_num)
     if err != 2:
       # Solution found or no solution exist after BFS. No need for DFS.
-      return sol, err
+      yield sol, err
+      return
+    elif beam_width:
+      steps = self._BeamSteps(beam_width, self.bfs_queue)
     else:
-      sol, err = self.IterativeDeepening()
-      return sol, err
+      steps = self._IterativeDeepeningSteps()
+    for step in steps:
+      yield step
+
+
+def _LastStep(steps):
+  '''
+  Run the slices of a search to the end. Return its (sol, err).
+  '''
+  for step in steps:
+    if step is not None:
+      return step
+
+
+class _SharedSearch(object):
+  '''
+  The counters and flags shared by the processes of a ParallelDFS.
+  '''
+  def __init__(self, num_states_seen, max_states_num):
+    import multiprocessing
+    self.lock = multiprocessing.Lock()
+    self.max_states_num = max_states_num
+    # Number of states taken from the budget, used or reserved.
+    self.states_used = multiprocessing.RawValue('l', num_states_seen)
+    # Number of tasks queued or being explored.
+    self.outstanding = multiprocessing.RawValue('l', 0)
+    # Number of workers waiting for work.
+    self.hungry = multiprocessing.RawValue('l', 0)
+    self.stop = multiprocessing.RawValue('b', 0)
+    self.exhausted = multiprocessing.RawValue('b', 0)
+
+  def Reset(self, num_states_seen):
+    '''
+    Get ready for a new search with one task outstanding, num_states_seen
+    states of the budget being used.
+    '''
+    self.states_used.value = num_states_seen
+    self.outstanding.value = 1
+    self.hungry.value = 0
+    self.stop.value = 0
+    self.exhausted.value = 0
+
+  def Reserve(self, num):
+    '''
+    Take up to num states from the budget. Return the number taken.
+    '''
+    with self.lock:
+      num = min(num, self.max_states_num - self.states_used.value)
+      self.states_used.value += num
+    return num
+
+  def Release(self, num):
+    '''
+    Give num unused states back to the budget.
+    '''
+    with self.lock:
+      self.states_used.value -= num
+
+  def AddTasks(self, num):
+    '''
+    Add num to the outstanding tasks. Return the new count.
+    '''
+    with self.lock:
+      self.outstanding.value += num
+      return self.outstanding.value
+
+  def AddHungry(self, num):
+    with self.lock:
+      self.hungry.value += num
+
+
+class _NewStates(dict):
+  '''
+  The dict of the states visited by a ParallelDFS worker, also keeping
+  in the field new the states visited since it was created.
+  '''
+  def __init__(self, states):
+    super(_NewStates, self).__init__(states)
+    self.new = {}
+
+  def __setitem__(self, state, history):
+    super(_NewStates, self).__setitem__(state, history)
+    self.new[state] = history
+
+
+class _DFSWorker(object):
+  '''
+  The DFS loop of a single ParallelDFS worker process, running the core
+  loop of its own copy of the solver. Tasks are tagged with the number
+  of the search they belong to, so that those left behind by an earlier
+  search are dropped.
+  '''
+  def __init__(self, solver, shared, tasks):
+    self.solver = solver
+    self.shared = shared
+    self.tasks = tasks
+    self.search = 0
+    self.max_depth = None
+    solver.seen_dfs_states = _NewStates(solver.seen_dfs_states)
+    solver._MoreStates = self._MoreStates
+
+  def Run(self, search, max_depth):
+    '''
+    Explore the tasks of the given search until a solution is found, the
+    budget is exhausted, or no task is left anywhere. Return the
+    solution, if any.
+    '''
+    try:
+      from Queue import Empty
+    except ImportError:
+      from queue import Empty
+    shared = self.shared
+    solver = self.solver
+    self.search = search
+    self.max_depth = max_depth
+    solver.seen_dfs_states.new = {}
+    # Visit states as they are taken from the shared budget.
+    solver.num_states_seen = solver.max_states_num = 0
+    idle = False
+    sol = None
+    while not shared.stop.value:
+      try:
+        task_search, nodes = self.tasks.get(timeout=IDLE_WAIT)
+      except Empty:
+        if not idle:
+          idle = True
+          shared.AddHungry(1)
+        if shared.AddTasks(0) == 0:
+          break
+        continue
+      if task_search != search:
+        continue
+      if idle:
+        idle = False
+        shared.AddHungry(-1)
+      sol = self._Explore(nodes)
+      shared.AddTasks(-1)
+      if sol:
+        shared.stop.value = 1
+        break
+    # Give the states taken but not visited back.
+    shared.Release(solver.max_states_num - solver.num_states_seen)
+    solver.max_states_num = solver.num_states_seen
+    return sol
+
+  def _MoreStates(self):
+    '''
+    Take up to BUDGET_CHUNK more states from the shared budget. Return
+    False if none is left.
+    '''
+    reserved = self.shared.Reserve(BUDGET_CHUNK)
+    if not reserved:
+      self.shared.exhausted.value = 1
+      self.shared.stop.value = 1
+      return False
+    self.solver.max_states_num += reserved
+    return True
+
+  def _Split(self, stack):
+    '''
+    Hand half of the shallowest nodes of the stack of a LifoFrontier
+    over to the task queue, at the first depth holding more than one
+    node. The stack is deepest on top, so these are the nodes the
+    worker would have expanded last.
+    '''
+    start = 0
+    while start < len(stack):
+      depth = stack[start][1]
+      if depth >= self.max_depth:
+        return
+      end = start
+      while end < len(stack) and stack[end][1] == depth:
+        end += 1
+      if end - start > 1:
+        half = (end - start) // 2
+        stolen = stack[start:start + half]
+        del stack[start:start + half]
+        self.shared.AddTasks(1)
+        self.tasks.put((self.search, stolen))
+        return
+      start = end
+
+  def _Explore(self, nodes):
+    '''
+    DFS from the (node, depth) entries of a task, whose nodes are already
+    visited, polling the shared flags every POLL_INTERVAL expansions.
+    Return the solution, if any.
+    '''
+    solver = self.solver
+    shared = self.shared
+    frontier = LifoFrontier(visited=solver.seen_dfs_states, revisit=True)
+    frontier.stack.extend(nodes)
+    while True:
+      solver.expansions_left = POLL_INTERVAL
+      sol, err = solver._Loop(frontier, self.max_depth)
+      if err is not None:
+        return sol
+      if shared.stop.value:
+        return None
+      if shared.hungry.value:
+        self._Split(frontier.stack)
+
+
+class _DFSPool(object):
+  '''
+  The worker processes of ParallelDFS, kept for as many searches as
+  wanted, so that an IterativeDeepening run starts them only once. The
+  states each search visits are passed on to every worker before the
+  next one starts.
+  '''
+  def __init__(self, solver, num_workers):
+    '''
+    Args:
+      solver: The IterativeDeepening object searching. The workers run on
+        copies of it.
+      num_workers: The number of worker processes, or the number of CPUs
+        if not more than 1.
+    '''
+    # Imported here, since it slows down the start of every program.
+    import multiprocessing
+    if num_workers <= 1:
+      num_workers = multiprocessing.cpu_count()
+    self.solver = solver
+    self.search = 0
+    # States visited since the workers last heard of the visited states.
+    self.unsynced = {}
+    self.shared = _SharedSearch(0, solver.max_states_num)
+    self.tasks = multiprocessing.Queue()
+    self.results = multiprocessing.Queue()
+    # Tasks left behind after a solution is found are dropped.
+    self.tasks.cancel_join_thread()
+    self.orders = [multiprocessing.Queue() for _ in range(num_workers)]
+    self.workers = [
+        multiprocessing.Process(
+            target=_RunDFSWorker,
+            args=(solver, self.shared, self.tasks, orders, self.results))
+        for orders in self.orders]
+    for worker in self.workers:
+      # Do not outlive the program if it is interrupted.
+      worker.daemon = True
+      worker.start()
+
+  def Explore(self, nodes, max_depth):
+    '''
+    DFS from the (node, depth) entries nodes, already visited, down to
+    max_depth. The states visited are merged into the seen_dfs_states of
+    the solver, and num_states_seen is updated.
+
+    Returns:
+      sol: The solution state. If not found, None is returned.
+      exhausted: Whether the budget ran out.
+    '''
+    solver = self.solver
+    shared = self.shared
+    self.search += 1
+    self.Visited(nodes)
+    shared.Reset(solver.num_states_seen)
+    self.tasks.put((self.search, nodes))
+    for orders in self.orders:
+      orders.put((self.search, max_depth, self.unsynced))
+    self.unsynced = {}
+    # Collect the results before anything else, so that no worker is
+    # blocked on a full pipe.
+    sol = None
+    for _ in self.workers:
+      worker_sol, worker_states = self.results.get()
+      sol = sol or worker_sol
+      solver.seen_dfs_states.update(worker_states)
+      self.unsynced.update(worker_states)
+    solver.num_states_seen = shared.states_used.value
+    return sol, bool(shared.exhausted.value)
+
+  def Visited(self, nodes):
+    '''
+    Tell the workers, along with the next search, that the nodes of the
+    (node, depth) entries nodes were visited.
+    '''
+    self.unsynced.update((node.state, node.history) for node, _ in nodes)
+
+  def Close(self):
+    '''
+    Stop the worker processes.
+    '''
+    for orders in self.orders:
+      orders.put(None)
+    for worker in self.workers:
+      worker.join()
+
+
+def _RunDFSWorker(solver, shared, tasks, orders, results):
+  '''
+  Entry point of a ParallelDFS worker process. For every search ordered,
+  update the states visited, run it, and put the solution found, if any,
+  and the newly seen states to results. A None order stops the worker.
+  '''
+  # Tasks left behind after a solution is found are dropped.
+  tasks.cancel_join_thread()
+  worker = _DFSWorker(solver, shared, tasks)
+  while True:
+    order = orders.get()
+    if order is None:
+      return
+    search, max_depth, states = order
+    # Not through __setitem__, so that these are not taken as new.
+    dict.update(solver.seen_dfs_states, states)
+    sol = worker.Run(search, max_depth)
+    results.put((sol, solver.seen_dfs_states.new))
@@ -1,7 +1,9 @@
 #! /usr/bin/python2
 # -*- coding: utf-8 -*-
 import unittest
+import iterative_deepening
 from iterative_deepening import State, Searchable, IterativeDeepening
+from iterative_deepening import BeamFrontier
 
 
 class TreeNode(object):
@@ -10,6 +12,17 @@ class TreeNode(object):
     self.left = None
     self.right = None
 
+  # Compared by value, so that the states passed between the processes
+  # of ParallelDFS are recognized.
+  def __eq__(self, other):
+    return isinstance(other, TreeNode) and self.val == other.val
+
+  def __ne__(self, other):
+    return not self == other
+
+  def __hash__(self):
+    return hash(self.val)
+
 
 class TreeState(State):
   def __init__(self, state, history=None):
@@ -99,6 +112,60 @@ class TreeTest(unittest.TestCase):
         [i.state.val for i in solver.bfs_queue])
     self.assertEqual(9, solver.num_states_seen)
 
+  def testLayeredBFSErr0(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(
+        tree_space,
+        max_queue_size=8,
+        max_states_num=16)
+    sol, err = solver.LayeredBFS()
+    self.assertEqual(target, sol.state.val)
+    self.assertEqual(0, err)
+    self.assertSequenceEqual(
+        range(7, 15),
+        [i.state.val for i in solver.bfs_queue])
+    self.assertEqual(14, solver.num_states_seen)
+
+  def testLayeredBFSErr1(self):
+    target = 17
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(
+        tree_space,
+        max_queue_size=8,
+        max_states_num=16)
+    sol, err = solver.LayeredBFS()
+    self.assertEqual(None, sol)
+    self.assertEqual(1, err)
+    self.assertSequenceEqual([], [i.state.val for i in solver.bfs_queue])
+    self.assertEqual(14, solver.num_states_seen)
+
+  def testLayeredBFSErr2A(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(
+        tree_space,
+        max_queue_size=3,
+        max_states_num=16)
+    sol, err = solver.LayeredBFS()
+    self.assertEqual(None, sol)
+    self.assertEqual(2, err)
+    self.assertSequenceEqual([1, 2], [i.state.val for i in solver.bfs_queue])
+    self.assertEqual(2, solver.num_states_seen)
+
+  def testLayeredBFSErr2B(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(
+        tree_space,
+        max_queue_size=8,
+        max_states_num=9)
+    sol, err = solver.LayeredBFS()
+    self.assertEqual(None, sol)
+    self.assertEqual(2, err)
+    self.assertSequenceEqual([7, 8, 9], [i.state.val for i in solver.bfs_queue])
+    self.assertEqual(9, solver.num_states_seen)
+
   def testDFSErr0A(self):
     target = 10
     tree_space = TreeSpace(TreeState(self.root), target)
@@ -148,6 +215,160 @@ class TreeTest(unittest.TestCase):
     self.assertEqual(2, err)
     self.assertEqual(7, solver.num_states_seen)
 
+  def testParallelDFSErr0(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(tree_space)
+    sol, err = solver.ParallelDFS(tree_space.start_point, num_workers=2)
+    self.assertEqual(target, sol.state.val)
+    self.assertEqual(0, err)
+
+  def testParallelDFSErr1(self):
+    target = 17
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(tree_space)
+    sol, err = solver.ParallelDFS(tree_space.start_point, num_workers=2)
+    self.assertEqual(None, sol)
+    self.assertEqual(1, err)
+    self.assertEqual(14, solver.num_states_seen)
+    self.assertEqual(14, len(solver.seen_dfs_states))
+
+  def testParallelDFSErr2(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(
+        tree_space, max_states_num=7)
+    sol, err = solver.ParallelDFS(tree_space.start_point, num_workers=2)
+    self.assertEqual(None, sol)
+    self.assertEqual(2, err)
+    self.assertEqual(7, solver.num_states_seen)
+
+  def testIterativeDeepeningParallel(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(
+        tree_space, max_states_num=16, num_workers=2)
+    sol, err = solver.IterativeDeepening([tree_space.start_point])
+    self.assertEqual(target, sol.state.val)
+    self.assertEqual(0, err)
+
+  def testIterativeDeepeningParallelPool(self):
+    pools = []
+
+    class CountedPool(iterative_deepening._DFSPool):
+      def __init__(self, *args):
+        super(CountedPool, self).__init__(*args)
+        pools.append(self)
+
+    target = 17
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(tree_space, num_workers=2)
+    original = iterative_deepening._DFSPool
+    iterative_deepening._DFSPool = CountedPool
+    try:
+      sol, err = solver.IterativeDeepening([tree_space.start_point])
+    finally:
+      iterative_deepening._DFSPool = original
+    self.assertEqual(None, sol)
+    self.assertEqual(1, err)
+    # The workers are started once, and told of the states visited.
+    self.assertEqual(1, len(pools))
+    self.assertEqual(14, solver.num_states_seen)
+    self.assertEqual(None, solver.dfs_pool)
+
+  def testBestFirstErr0A(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(tree_space, max_states_num=16)
+    sol, err = solver.BestFirst()
+    self.assertEqual(target, sol.state.val)
+    self.assertEqual(0, err)
+    self.assertEqual(10, solver.num_states_seen)
+
+  def testBestFirstErr0B(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(tree_space, max_states_num=16)
+    sol, err = solver.BestFirst(key=lambda s: -s.state.val)
+    self.assertEqual(target, sol.state.val)
+    self.assertEqual(0, err)
+    self.assertEqual(12, solver.num_states_seen)
+
+  def testBestFirstErr2(self):
+    target = 17
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(tree_space, max_states_num=9)
+    sol, err = solver.BestFirst()
+    self.assertEqual(None, sol)
+    self.assertEqual(2, err)
+    self.assertEqual(9, solver.num_states_seen)
+
+  def testRunBeamErr0(self):
+    target = 12
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(tree_space)
+    frontier = BeamFrontier(lambda s: -s.state.val, 2)
+    sol, err = solver.Run(frontier)
+    self.assertEqual(target, sol.state.val)
+    self.assertEqual(0, err)
+    self.assertEqual(10, solver.num_states_seen)
+    self.assertSequenceEqual(
+        [14, 13], [i.state.val for i in frontier.Nodes()])
+
+  def testRunBeamErr1(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(tree_space)
+    sol, err = solver.Run(BeamFrontier(lambda s: -s.state.val, 2))
+    self.assertEqual(None, sol)
+    self.assertEqual(1, err)
+    self.assertEqual(10, solver.num_states_seen)
+
+  def testBeamSearchErr0(self):
+    target = 12
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(tree_space)
+    sol, err = solver.BeamSearch(2, key=lambda s: -s.state.val)
+    self.assertEqual(target, sol.state.val)
+    self.assertEqual(0, err)
+    self.assertEqual(10, solver.num_states_seen)
+
+  def testBeamSearchSeeds(self):
+    target = 5
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(tree_space)
+    seeds = [TreeState(self.root.left), TreeState(self.root.right)]
+    sol, err = solver.BeamSearch(1, seeds)
+    self.assertEqual(target, sol.state.val)
+    self.assertEqual(0, err)
+
+  def testBeamSearchErr1(self):
+    target = 17
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(tree_space)
+    sol, err = solver.BeamSearch(8)
+    self.assertEqual(None, sol)
+    self.assertEqual(1, err)
+    self.assertEqual(14, solver.num_states_seen)
+
+  def testBeamSearchErr2A(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(tree_space)
+    sol, err = solver.BeamSearch(2, key=lambda s: -s.state.val)
+    self.assertEqual(None, sol)
+    self.assertEqual(2, err)
+    self.assertEqual(10, solver.num_states_seen)
+
+  def testBeamSearchErr2B(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(tree_space, max_states_num=5)
+    sol, err = solver.BeamSearch(8)
+    self.assertEqual(None, sol)
+    self.assertEqual(2, err)
+    self.assertEqual(5, solver.num_states_seen)
+
   def testIterativeDeepeningErr0(self):
     target = 10
     tree_space = TreeSpace(TreeState(self.root), target)
@@ -178,6 +399,121 @@ class TreeTest(unittest.TestCase):
     self.assertEqual(2, err)
     self.assertEqual(9, solver.num_states_seen)
 
+  def testShortestSearchErr0A(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(
+        tree_space,
+        max_queue_size=3,
+        max_states_num=16)
+    sol, err = solver.ShortestSearch()
+    self.assertEqual(target, sol.state.val)
+    self.assertEqual(0, err)
+    self.assertSequenceEqual([1, 2], [i.state.val for i in solver.bfs_queue])
+    self.assertEqual(10, solver.num_states_seen)
+
+  def testShortestSearchErr0B(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(
+        tree_space,
+        max_queue_size=0,
+        max_states_num=16)
+    sol, err = solver.ShortestSearch()
+    self.assertEqual(target, sol.state.val)
+    self.assertEqual(0, err)
+    self.assertEqual(10, solver.num_states_seen)
+
+  def testShortestSearchSameChildren(self):
+    target = 4
+    nodes = [TreeNode(i) for i in range(5)]
+    nodes[0].left, nodes[0].right = nodes[1], nodes[2]
+    nodes[1].left = nodes[1].right = nodes[3]
+    nodes[3].left = nodes[4]
+    tree_space = TreeSpace(TreeState(nodes[0]), target)
+    solver = IterativeDeepening(
+        tree_space, max_queue_size=0, max_states_num=100)
+    sol, err = solver.ShortestSearch()
+    self.assertEqual(target, sol.state.val)
+    self.assertEqual(0, err)
+
+  def testShortestSearchErr1(self):
+    target = 17
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(
+        tree_space,
+        max_queue_size=3,
+        max_states_num=16)
+    sol, err = solver.ShortestSearch()
+    self.assertEqual(None, sol)
+    self.assertEqual(1, err)
+    self.assertEqual(14, solver.num_states_seen)
+
+  def testShortestSearchErr2(self):
+    target = 17
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(
+        tree_space,
+        max_queue_size=3,
+        max_states_num=9)
+    sol, err = solver.ShortestSearch()
+    self.assertEqual(None, sol)
+    self.assertEqual(2, err)
+    self.assertEqual(9, solver.num_states_seen)
+
+  def testSolutionsErr1(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(tree_space)
+    results = list(solver.Solutions())
+    self.assertSequenceEqual(
+        [(target, 0), (None, 1)],
+        [(sol and sol.state.val, err) for sol, err in results])
+    # The nodes of every iteration are counted.
+    self.assertEqual(36, solver.num_states_seen)
+
+  def testSolutionsErr2(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(
+        tree_space, max_states_num=9)
+    results = list(solver.Solutions())
+    self.assertSequenceEqual([(None, 2)], results)
+    self.assertEqual(9, solver.num_states_seen)
+
+  def testSolutionsMaxDepth(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(tree_space)
+    results = list(solver.Solutions(max_depth=2))
+    self.assertSequenceEqual([(None, 2)], results)
+    self.assertEqual(8, solver.num_states_seen)
+
+  def testSolutionsFruitlessCycle(self):
+    target = 1
+    nodes = [TreeNode(i) for i in range(4)]
+    nodes[0].left, nodes[0].right = nodes[1], nodes[2]
+    nodes[2].left = nodes[3]
+    nodes[3].left = nodes[2]
+    tree_space = TreeSpace(TreeState(nodes[0]), target)
+    solver = IterativeDeepening(tree_space)
+    results = list(solver.Solutions())
+    self.assertSequenceEqual(
+        [(target, 0), (None, 1)],
+        [(sol and sol.state.val, err) for sol, err in results])
+
+  def testSolutionsCycle(self):
+    target = 1
+    nodes = [TreeNode(i) for i in range(3)]
+    nodes[0].left, nodes[0].right = nodes[1], nodes[2]
+    nodes[2].left = nodes[0]
+    tree_space = TreeSpace(TreeState(nodes[0]), target)
+    solver = IterativeDeepening(tree_space)
+    results = list(solver.Solutions(max_depth=5))
+    self.assertSequenceEqual(
+        [(target, 0), (target, 0), (target, 0), (None, 2)],
+        [(sol and sol.state.val, err) for sol, err in results])
+
   def testSearchErr0A(self):
     target = 10
     tree_space = TreeSpace(TreeState(self.root), target)
@@ -230,6 +566,69 @@ class TreeTest(unittest.TestCase):
     self.assertSequenceEqual([0], [i.state.val for i in solver.bfs_queue])
     self.assertEqual(10, solver.num_states_seen)
 
+  def testSearchBatchedErr0(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(
+        tree_space,
+        max_queue_size=3,
+        max_states_num=16)
+    sol, err = solver.Search(batched=True)
+    self.assertEqual(target, sol.state.val)
+    self.assertEqual(0, err)
+    self.assertSequenceEqual([1, 2], [i.state.val for i in solver.bfs_queue])
+
+  def testSearchBeamErr0(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(
+        tree_space,
+        max_queue_size=3,
+        max_states_num=16)
+    sol, err = solver.Search(beam_width=4)
+    self.assertEqual(target, sol.state.val)
+    self.assertEqual(0, err)
+    self.assertEqual(10, solver.num_states_seen)
+
+  def testSearchSteps(self):
+    target = 10
+    tree_space = TreeSpace(TreeState(self.root), target)
+    solver = IterativeDeepening(
+        tree_space,
+        max_queue_size=3,
+        max_states_num=16)
+    steps = list(solver.SearchSteps(quantum=1))
+    self.assertTrue(len(steps) > 1)
+    self.assertSequenceEqual([None] * (len(steps) - 1), steps[:-1])
+    sol, err = steps[-1]
+    self.assertEqual(target, sol.state.val)
+    self.assertEqual(0, err)
+    self.assertSequenceEqual([2, 3, 4], [i.state.val for i in solver.bfs_queue])
+    self.assertEqual(10, solver.num_states_seen)
+
+  def testSearchStepsQuantum(self):
+    target = 17
+    tree_space = TreeSpace(TreeState(self.root), target)
+    expanded = []
+    neighbors = tree_space.Neighbors
+    tree_space.Neighbors = lambda state: (
+        expanded.append(state) or neighbors(state))
+    solver = IterativeDeepening(
+        tree_space,
+        max_queue_size=4,
+        max_states_num=100)
+    # The DFS from every seed BFS leaves takes fewer expansions than the
+    # quantum, which spans them.
+    quantum = 4
+    expansions = []
+    for step in solver.SearchSteps(quantum=quantum):
+      expansions.append(len(expanded))
+      del expanded[:]
+    self.assertEqual((None, 1), step)
+    self.assertTrue(len(expansions) > 1)
+    self.assertTrue(all(num <= quantum for num in expansions))
+    self.assertEqual(None, solver.expansions_left)
+
   def testSearchErr1(self):
     target = 17
     tree_space = TreeSpace(TreeState(self.root), target)
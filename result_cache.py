@@ -0,0 +1,161 @@
+#! /usr/bin/python2
+# -*- coding: utf-8 -*-
+'''
+This module implements an on-disk cache of the results of the search
+on sets of dominos. An entry is keyed by a canonical hash of the domino
+multiset, which ignores the indices, so that the same dominos numbered
+differently hit the same entry. Only the results that do not depend on
+the constraints of the search are kept, namely the solutions (error
+code 0) and the proofs that no solution exists (error code 1) given by
+a complete search. Beam search, which leaves states out, proves nothing.
+
+Every entry is a JSON file in the cache directory. The least recently
+used entries are evicted when there are more than max_entries of them.
+'''
+
+import os
+import sys
+import json
+import hashlib
+import tempfile
+
+
+def _Log(msg, *args):
+  '''
+  Log an info message through the logger of the module, if the program
+  imported logging. See iterative_deepening._Log.
+  '''
+  logging = sys.modules.get("logging")
+  if logging is not None:
+    logging.getLogger(__name__).info(msg, *args)
+
+
+class ResultCache(object):
+  '''
+  The cache of search results on sets of dominos. The dominos are
+  objects with the fields index, and content: (str_top, str_bottom).
+  '''
+  def __init__(self, directory, max_entries=1000):
+    '''
+    Args:
+      directory:   The directory holding the entries. Created if missing.
+      max_entries: The maximum number of entries to keep.
+    '''
+    self.directory = directory
+    self.max_entries = max_entries
+    if not os.path.isdir(directory):
+      os.makedirs(directory)
+
+  @staticmethod
+  def _Canonical(dominos):
+    '''
+    Sort the dominos by content, ignoring the indices.
+
+    Returns:
+      key: The hash of the sorted contents.
+      contents: The sorted contents, as lists of two strings.
+      indices: The indices of the dominos in the same order.
+    '''
+    ordered = sorted(dominos, key=lambda d: (tuple(d.content), d.index))
+    contents = [list(d.content) for d in ordered]
+    indices = [d.index for d in ordered]
+    key = hashlib.sha1(json.dumps(contents).encode("utf-8")).hexdigest()
+    return key, contents, indices
+
+  def _Path(self, key):
+    return os.path.join(self.directory, key + ".json")
+
+  def Lookup(self, dominos, shortest=False):
+    '''
+    Look for the result of a previous search on the same dominos.
+
+    Args:
+      dominos: A list of dominos.
+      shortest: Only accept a solution found by a search for the
+        shortest one.
+    Returns:
+      None if there is no such result. Otherwise a tuple of
+      history: The solution as a list of the current domino indices,
+        None if there is no solution.
+      err: Exit code
+        0 - sulution found;
+        1 - no soluion exists.
+    '''
+    key, contents, indices = self._Canonical(dominos)
+    path = self._Path(key)
+    try:
+      with open(path) as fin:
+        entry = json.load(fin)
+    except (IOError, OSError, ValueError):
+      return None
+    if entry["dominos"] != contents:
+      # Hash collision.
+      return None
+    if entry["err"] == 0 and shortest and not entry["shortest"]:
+      return None
+    try:
+      # Mark the entry as recently used.
+      os.utime(path, None)
+    except OSError:
+      pass
+    _Log("cache hit: %s", key)
+    if entry["err"] != 0:
+      return None, entry["err"]
+    return [indices[i] for i in entry["solution"]], 0
+
+  def Store(self, dominos, history, err, shortest=False, complete=True):
+    '''
+    Keep the result of a search on the dominos. Results depending on the
+    constraints of the search (error code 2) are ignored, and so is
+    error code 1 from an incomplete search.
+
+    Args:
+      dominos: A list of dominos.
+      history: The solution as a list of domino indices, None if there
+        is no solution.
+      err: The exit code of the search.
+      shortest: Whether the solution is known to be the shortest.
+      complete: Whether the search explores every state it may reach, so
+        that error code 1 proves there is no solution. Beam search, for
+        one, does not.
+    '''
+    if err == 2 or (err == 1 and not complete):
+      return
+    key, contents, indices = self._Canonical(dominos)
+    positions = {}
+    for pos, index in enumerate(indices):
+      positions.setdefault(index, pos)
+    entry = {
+        "dominos": contents,
+        "err": err,
+        "solution": [positions[i] for i in history] if err == 0 else None,
+        "shortest": bool(shortest),
+    }
+    # Write to a temporary file first, so that no reader ever sees a
+    # partial entry.
+    fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+    with os.fdopen(fd, "w") as fout:
+      json.dump(entry, fout)
+    os.rename(tmp_path, self._Path(key))
+    self._Evict()
+
+  def _Evict(self):
+    '''
+    Remove the least recently used entries beyond max_entries.
+    '''
+    entries = []
+    for fname in os.listdir(self.directory):
+      if fname.endswith(".json"):
+        path = os.path.join(self.directory, fname)
+        try:
+          entries.append((os.path.getmtime(path), fname, path))
+        except OSError:
+          continue
+    if len(entries) <= self.max_entries:
+      return
+    entries.sort()
+    for _, _, path in entries[:len(entries) - self.max_entries]:
+      try:
+        os.remove(path)
+      except OSError:
+        pass
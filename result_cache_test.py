@@ -0,0 +1,83 @@
+#! /usr/bin/python2
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+from dominos import Domino
+from result_cache import ResultCache
+
+
+class ResultCacheTest(unittest.TestCase):
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+    self.dominos = [
+        Domino(1, ("c", "cca")), Domino(2, ("ac", "ba")),
+        Domino(3, ("bb", "b")), Domino(4, ("ac", "cb")),
+    ]
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def testMiss(self):
+    cache = ResultCache(self.directory)
+    self.assertEqual(None, cache.Lookup(self.dominos))
+
+  def testSolution(self):
+    cache = ResultCache(self.directory)
+    cache.Store(self.dominos, [3, 2, 1, 4, 3], 0)
+    self.assertEqual(([3, 2, 1, 4, 3], 0), cache.Lookup(self.dominos))
+
+  def testSolutionRemapped(self):
+    cache = ResultCache(self.directory)
+    cache.Store(self.dominos, [3, 2, 1, 4, 3], 0)
+    permuted = [
+        Domino(1, ("ac", "cb")), Domino(2, ("bb", "b")),
+        Domino(3, ("c", "cca")), Domino(4, ("ac", "ba")),
+    ]
+    self.assertEqual(([2, 4, 3, 1, 2], 0), cache.Lookup(permuted))
+
+  def testNoSolution(self):
+    cache = ResultCache(self.directory)
+    cache.Store(self.dominos, None, 1)
+    self.assertEqual((None, 1), cache.Lookup(self.dominos))
+    self.assertEqual((None, 1), cache.Lookup(self.dominos, shortest=True))
+
+  def testIncomplete(self):
+    cache = ResultCache(self.directory)
+    cache.Store(self.dominos, None, 1, complete=False)
+    self.assertEqual(None, cache.Lookup(self.dominos))
+    cache.Store(self.dominos, [3, 2, 1, 4, 3], 0, complete=False)
+    self.assertEqual(([3, 2, 1, 4, 3], 0), cache.Lookup(self.dominos))
+
+  def testConstrained(self):
+    cache = ResultCache(self.directory)
+    cache.Store(self.dominos, None, 2)
+    self.assertEqual(None, cache.Lookup(self.dominos))
+
+  def testShortest(self):
+    cache = ResultCache(self.directory)
+    cache.Store(self.dominos, [3, 2, 1, 4, 3], 0)
+    self.assertEqual(None, cache.Lookup(self.dominos, shortest=True))
+    cache.Store(self.dominos, [3, 2, 1, 4, 3], 0, shortest=True)
+    self.assertEqual(
+        ([3, 2, 1, 4, 3], 0), cache.Lookup(self.dominos, shortest=True))
+
+  def testEviction(self):
+    cache = ResultCache(self.directory, max_entries=2)
+    instances = [[Domino(1, (str(i), str(i)))] for i in range(3)]
+    cache.Store(instances[0], [1], 0)
+    cache.Store(instances[1], [1], 0)
+    # Make the first entry the most recently used one.
+    for fname in os.listdir(self.directory):
+      os.utime(os.path.join(self.directory, fname), (0, 0))
+    cache.Lookup(instances[0])
+    cache.Store(instances[2], [1], 0)
+    self.assertEqual(2, len(os.listdir(self.directory)))
+    self.assertEqual(([1], 0), cache.Lookup(instances[0]))
+    self.assertEqual(None, cache.Lookup(instances[1]))
+    self.assertEqual(([1], 0), cache.Lookup(instances[2]))
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -0,0 +1,170 @@
+#! /usr/bin/python2
+# -*- coding: utf-8 -*-
+'''
+This module implements a scheduler running many searches at once on a
+pool of worker processes. Every search is handed to the worker holding
+the fewest, which takes it up at once, and runs all its searches in
+turn in slices of a fixed number of expansions through
+IterativeDeepening.SearchSteps. An easy search thus finishes after a
+few slices, whatever the searches submitted before it.
+
+Within a worker, the slices are shared out by stride scheduling: every
+slice costs a search 1 + priority units of virtual time, and the search
+of lowest virtual time runs next. A search of priority 0 thus gets
+twice as many slices as one of priority 1, and no search starves. A
+search past its deadline is stopped with error code 2.
+'''
+
+import heapq
+import logging
+import itertools
+import multiprocessing
+import time
+try:
+  import cPickle as pickle
+except ImportError:
+  import pickle
+try:
+  from Queue import Empty
+except ImportError:
+  from queue import Empty
+
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Scheduler(object):
+  '''
+  The pool of worker processes running the submitted searches.
+  '''
+  def __init__(self, num_workers=None, quantum=1000):
+    '''
+    Args:
+      num_workers: The number of worker processes. Default to the number
+        of CPUs.
+      quantum:     The number of expansions per slice.
+    '''
+    num_workers = num_workers or multiprocessing.cpu_count()
+    # One queue of tasks per worker, so that the searches are spread
+    # evenly rather than taken by whichever worker asks first.
+    self.tasks = [multiprocessing.Queue() for _ in range(num_workers)]
+    self.results = multiprocessing.Queue()
+    self.counter = itertools.count()
+    # Number of searches held by every worker, and the worker of every
+    # search not finished yet.
+    self.loads = [0] * num_workers
+    self.assigned = {}
+    self.workers = [
+        multiprocessing.Process(
+            target=_RunWorker,
+            args=(tasks, self.results, quantum))
+        for tasks in self.tasks]
+    for worker in self.workers:
+      worker.daemon = True
+      worker.start()
+
+  def Submit(self, solver, priority=0, deadline=None, **kwargs):
+    '''
+    Submit a search to the pool.
+
+    Args:
+      solver: The IterativeDeepening object to run Search on. It is sent
+        to a worker, and has to be picklable: it is pickled at once, so
+        that the pickling error is raised here rather than lost in the
+        background thread of the queue. Its searches run in the worker
+        process only, whatever its num_workers.
+      priority: A non-negative number, lower meaning more slices.
+      deadline: The number of seconds from now after which the search is
+        stopped. Default to no deadline.
+      kwargs: The arguments of Search.
+    Return:
+      The id of the search, to match it with its result.
+    '''
+    search_id = next(self.counter)
+    if deadline is not None:
+      deadline += time.time()
+    task = pickle.dumps((search_id, solver, priority, deadline, kwargs), -1)
+    worker = min(range(len(self.loads)), key=self.loads.__getitem__)
+    self.tasks[worker].put(task)
+    self.loads[worker] += 1
+    self.assigned[search_id] = worker
+    return search_id
+
+  def Results(self):
+    '''
+    Generator yielding the results of the submitted searches, in the
+    order they finish, until none is left.
+
+    Yields:
+      (search_id, sol, err), sol and err being those of Search. A search
+      raising an exception ends with error code 2.
+    '''
+    while self.assigned:
+      result = self.results.get()
+      self.loads[self.assigned.pop(result[0])] -= 1
+      yield result
+
+  def Close(self):
+    '''
+    Stop the workers once they are done with the submitted searches.
+    '''
+    for tasks in self.tasks:
+      tasks.put(None)
+    for worker in self.workers:
+      worker.join()
+
+
+def _RunWorker(tasks, results, quantum):
+  '''
+  Entry point of a worker process. Take the searches from tasks as they
+  come, run them slice by slice, and put their results to results,
+  until None is taken from tasks.
+  '''
+  # Heap of [virtual time, deadline, sequence number, search id,
+  # priority, steps] of the searches held.
+  run_queue = []
+  sequence = itertools.count()
+  closing = False
+  while True:
+    while not closing:
+      try:
+        # Only block for new searches when there is nothing to run.
+        task = tasks.get(block=not run_queue)
+      except Empty:
+        break
+      if task is None:
+        closing = True
+        break
+      search_id, solver, priority, deadline, kwargs = pickle.loads(task)
+      # The searches of a worker stay in its process.
+      solver.num_workers = 1
+      # Start at the current virtual time, so as to neither wait for
+      # nor overtake the searches held.
+      vtime = run_queue[0][0] if run_queue else 0
+      steps = solver.SearchSteps(quantum, **kwargs)
+      heapq.heappush(run_queue, [
+          vtime, deadline if deadline is not None else float("inf"),
+          next(sequence), search_id, priority, steps])
+    if not run_queue:
+      if closing:
+        return
+      continue
+    entry = heapq.heappop(run_queue)
+    _, deadline, _, search_id, priority, steps = entry
+    if time.time() > deadline:
+      _LOGGER.info("search %r past its deadline", search_id)
+      results.put((search_id, None, 2))
+      continue
+    try:
+      step = next(steps)
+    except Exception:
+      # Keep the worker, and the other searches it holds, running.
+      _LOGGER.exception("search %r failed", search_id)
+      results.put((search_id, None, 2))
+      continue
+    if step is None:
+      entry[0] += 1 + priority
+      heapq.heappush(run_queue, entry)
+    else:
+      sol, err = step
+      results.put((search_id, sol, err))
@@ -0,0 +1,106 @@
+#! /usr/bin/python2
+# -*- coding: utf-8 -*-
+import unittest
+from dominos import Domino, DominoSpace
+from iterative_deepening import IterativeDeepening
+from scheduler import Scheduler
+
+
+class BrokenSpace(DominoSpace):
+  def Neighbors(self, state):
+    raise ValueError("broken")
+
+
+def Solver(dominos, max_queue_size=0, max_states_num=10**6, num_workers=1,
+           space=DominoSpace):
+  return IterativeDeepening(
+      space(dominos=dominos),
+      max_queue_size=max_queue_size,
+      max_states_num=max_states_num,
+      num_workers=num_workers)
+
+
+class SchedulerTest(unittest.TestCase):
+  def setUp(self):
+    self.easy = [
+        Domino(1, ("c", "cca")), Domino(2, ("ac", "ba")),
+        Domino(3, ("bb", "b")), Domino(4, ("ac", "cb")),
+    ]
+    self.impossible = [Domino(1, ("a", "b")), Domino(2, ("b", "a"))]
+    # The shortest solution is 66 dominos long.
+    self.hard = [
+        Domino(1, ("aab", "a")), Domino(2, ("ab", "abb")),
+        Domino(3, ("ab", "bab")), Domino(4, ("ba", "aab")),
+    ]
+    self.scheduler = Scheduler(num_workers=1, quantum=50)
+
+  def tearDown(self):
+    self.scheduler.Close()
+
+  def testResults(self):
+    easy_id = self.scheduler.Submit(Solver(self.easy))
+    impossible_id = self.scheduler.Submit(Solver(self.impossible))
+    results = dict(
+        (search_id, (sol and sol.history, err))
+        for search_id, sol, err in self.scheduler.Results())
+    self.assertEqual(([3, 2, 1, 4, 3], 0), results[easy_id])
+    self.assertEqual((None, 1), results[impossible_id])
+
+  def testEasyFirst(self):
+    hard_id = self.scheduler.Submit(Solver(self.hard), deadline=1)
+    easy_id = self.scheduler.Submit(Solver(self.easy))
+    results = list(self.scheduler.Results())
+    self.assertSequenceEqual(
+        [easy_id, hard_id], [search_id for search_id, _, _ in results])
+
+  def testManyHard(self):
+    hard_ids = [
+        self.scheduler.Submit(Solver(self.hard), deadline=1)
+        for _ in range(10)]
+    easy_id = self.scheduler.Submit(Solver(self.easy))
+    results = list(self.scheduler.Results())
+    self.assertEqual(easy_id, results[0][0])
+    self.assertSequenceEqual(
+        sorted(hard_ids), sorted(search_id for search_id, _, _ in results[1:]))
+
+  def testFailure(self):
+    broken_id = self.scheduler.Submit(Solver(self.easy, space=BrokenSpace))
+    easy_id = self.scheduler.Submit(Solver(self.easy))
+    results = dict(
+        (search_id, (sol and sol.history, err))
+        for search_id, sol, err in self.scheduler.Results())
+    self.assertEqual((None, 2), results[broken_id])
+    self.assertEqual(([3, 2, 1, 4, 3], 0), results[easy_id])
+
+  def testUnpicklable(self):
+    solver = Solver(self.easy)
+    solver.searchable.key = lambda node: 0
+    self.assertRaises(Exception, self.scheduler.Submit, solver)
+    easy_id = self.scheduler.Submit(Solver(self.easy))
+    self.assertSequenceEqual(
+        [(easy_id, [3, 2, 1, 4, 3], 0)],
+        [(result_id, sol and sol.history, err)
+         for result_id, sol, err in self.scheduler.Results()])
+
+  def testWorkersOfSolver(self):
+    search_id = self.scheduler.Submit(Solver(self.easy, num_workers=2))
+    self.assertSequenceEqual(
+        [(search_id, [3, 2, 1, 4, 3], 0)],
+        [(result_id, sol and sol.history, err)
+         for result_id, sol, err in self.scheduler.Results()])
+
+  def testDeadline(self):
+    hard_id = self.scheduler.Submit(Solver(self.hard), deadline=0.1)
+    self.assertSequenceEqual(
+        [(hard_id, None, 2)], list(self.scheduler.Results()))
+
+  def testSearchArguments(self):
+    search_id = self.scheduler.Submit(Solver(self.hard), beam_width=100)
+    [(result_id, sol, err)] = list(self.scheduler.Results())
+    self.assertEqual(search_id, result_id)
+    self.assertEqual(0, err)
+    self.assertEqual(66, len(sol.history))
+
+
+if __name__ == "__main__":
+  unittest.main()
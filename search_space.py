@@ -0,0 +1,88 @@
+#! /usr/bin/python2
+# -*- coding: utf-8 -*-
+'''
+This module provides the abstract classes of the generic search
+framework of iterative_deepening: State, wrapping the customized
+states, and Searchable, the search space. They are kept apart from the
+search itself, so that defining a search space is cheap to import.
+'''
+
+
+class State(object):
+  '''
+  Abstract class for the states and its history in the search space.
+  '''
+  def __init__(self, state=None, history=None):
+    self.state = state
+    self.history = history
+
+
+class Searchable(object):
+  '''
+  Abstract class for the search space.
+  '''
+  def __init__(self, start_point=None):
+    self.start_point = start_point
+
+  def Neighbors(self, state):
+    '''
+    Generates the neighbors of the given state in the search space.
+
+    Args:
+      state: The State object whose neighbors are to be returned.
+    Return:
+      A list of State objects.
+    '''
+    raise NotImplementedError()
+
+  def Assert(self, state):
+    '''
+    Assert if a given state satisfies the terminating condition.
+
+    Args:
+      state: The State Object to be asserted.
+    Return:
+      bool
+    '''
+    raise NotImplementedError()
+
+  def NeighborsBatch(self, states):
+    '''
+    Generates the neighbors of a whole layer of states at once.
+    Subclasses may override this to expand the layer in bulk. The
+    default falls back to calling Neighbors on every state.
+
+    Args:
+      states: A list of State objects whose neighbors are to be returned.
+    Return:
+      A list of State objects, the neighbors of states[0] first, then
+      those of states[1], and so forth.
+    '''
+    neighbors = []
+    for state in states:
+      neighbors.extend(self.Neighbors(state))
+    return neighbors
+
+  def AssertBatch(self, states):
+    '''
+    Assert the terminating condition on a list of states at once.
+    The default falls back to calling Assert on every state.
+
+    Args:
+      states: A list of State objects to be asserted.
+    Return:
+      A list of bool, one for each state.
+    '''
+    return [self.Assert(state) for state in states]
+
+  def Score(self, state):
+    '''
+    Estimate how promising a state is, for the best-first strategies.
+    The default scores all states equally.
+
+    Args:
+      state: The State object to be scored.
+    Return:
+      A number, lower meaning more promising.
+    '''
+    return 0